@@ -0,0 +1,322 @@
+from datetime import datetime, timedelta
+from database_orm import Database
+from env import strategy_interval
+from timeframes import Timeframe
+
+CYCLE_SECONDS = Timeframe(strategy_interval).minutes * 60  # Rollups are bucketed on the strategy's candle boundaries
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+FINAL_ORDER_STATUSES = ('FILLED', 'CANCELED', 'EXPIRED', 'REJECTED')
+
+
+def _parse_ts(value):
+    return datetime.strptime(value[:19], TIMESTAMP_FORMAT)
+
+
+def _cycle_start(ts):
+    epoch = int((ts - datetime(1970, 1, 1)).total_seconds())
+    return datetime(1970, 1, 1) + timedelta(seconds=epoch - epoch % CYCLE_SECONDS)
+
+
+class Analytics:
+    """
+    Incrementally maintained rollups over balance_history and orders.
+    refresh() only reads raw rows that arrived since the previous call, so
+    queries stay fast no matter how much raw history has accumulated.
+    """
+    def __init__(self, db: Database):
+        self.db = db
+        self.init_tables()
+
+    def init_tables(self):
+        conn = self.db.conn
+        # Per-cycle equity, one row per strategy candle and asset (last sample in the bucket wins)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS equity_cycles (
+                cycle_ts DATETIME,
+                asset TEXT,
+                wallet_balance REAL,
+                unrealized_pnl REAL,
+                equity REAL,
+                PRIMARY KEY (asset, cycle_ts)
+            )
+        ''')
+        # Running position and realized PnL per symbol (average cost accounting)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS symbol_pnl (
+                symbol TEXT PRIMARY KEY,
+                position_qty REAL,
+                avg_price REAL,
+                realized_pnl REAL,
+                turnover REAL,
+                trades INTEGER
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS daily_stats (
+                day DATE PRIMARY KEY,
+                trades INTEGER DEFAULT 0,
+                turnover REAL DEFAULT 0,
+                realized_pnl REAL DEFAULT 0,
+                open_equity REAL,
+                close_equity REAL,
+                high_equity REAL,
+                low_equity REAL
+            )
+        ''')
+        # Orders already folded into the rollups (orders are upserted, so an id watermark is not enough)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS analytics_processed_orders (
+                order_id INTEGER PRIMARY KEY
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS analytics_state (
+                key TEXT PRIMARY KEY,
+                value INTEGER
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_equity_cycles_cycle_ts ON equity_cycles (cycle_ts)")
+        conn.commit()
+
+    def _get_state(self, key, default=0):
+        row = self.db.conn.execute("SELECT value FROM analytics_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_state(self, key, value):
+        self.db.conn.execute('''
+            INSERT INTO analytics_state (key, value) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value
+        ''', (key, value))
+
+    def refresh(self):
+        """Fold raw rows written since the last refresh into the rollup tables."""
+        # Queued writes must be committed before we read them
+        self.db.flush()
+        conn = self.db.conn
+        try:
+            with conn:
+                balances = self._refresh_equity(conn)
+                orders = self._refresh_orders(conn)
+            return balances, orders
+        except Exception as e:
+            print(f"Analytics Error refreshing rollups: {e}")
+            return 0, 0
+
+    def _refresh_equity(self, conn):
+        last_id = self._get_state('balance_history_last_id')
+        rows = conn.execute('''
+            SELECT id, asset, wallet_balance, unrealized_pnl, timestamp
+            FROM balance_history WHERE id > ? ORDER BY id
+        ''', (last_id,)).fetchall()
+        if not rows:
+            return 0
+
+        cycles = {}
+        daily = {}
+        for row_id, asset, wallet_balance, unrealized_pnl, timestamp in rows:
+            ts = _parse_ts(timestamp)
+            equity = wallet_balance + (unrealized_pnl or 0)
+            cycles[(asset, _cycle_start(ts))] = (wallet_balance, unrealized_pnl, equity)
+            if asset == 'USDT':
+                day = ts.date().isoformat()
+                if day not in daily:
+                    daily[day] = [equity, equity, equity, equity]  # open, close, high, low
+                stats = daily[day]
+                stats[1] = equity
+                stats[2] = max(stats[2], equity)
+                stats[3] = min(stats[3], equity)
+
+        conn.executemany('''
+            INSERT INTO equity_cycles (cycle_ts, asset, wallet_balance, unrealized_pnl, equity)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(asset, cycle_ts) DO UPDATE SET
+                wallet_balance = excluded.wallet_balance,
+                unrealized_pnl = excluded.unrealized_pnl,
+                equity = excluded.equity
+        ''', [
+            (cycle_ts.strftime(TIMESTAMP_FORMAT), asset, wallet_balance, unrealized_pnl, equity)
+            for (asset, cycle_ts), (wallet_balance, unrealized_pnl, equity) in cycles.items()
+        ])
+        conn.executemany('''
+            INSERT INTO daily_stats (day, open_equity, close_equity, high_equity, low_equity)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(day) DO UPDATE SET
+                open_equity = COALESCE(daily_stats.open_equity, excluded.open_equity),
+                close_equity = excluded.close_equity,
+                high_equity = MAX(COALESCE(daily_stats.high_equity, excluded.high_equity), excluded.high_equity),
+                low_equity = MIN(COALESCE(daily_stats.low_equity, excluded.low_equity), excluded.low_equity)
+        ''', [(day, *stats) for day, stats in daily.items()])
+        self._set_state('balance_history_last_id', rows[-1][0])
+        return len(rows)
+
+    def _refresh_orders(self, conn):
+        rows = conn.execute('''
+            SELECT o.order_id, o.symbol, o.side, o.quantity, o.price, o.timestamp
+            FROM orders o
+            LEFT JOIN analytics_processed_orders p ON p.order_id = o.order_id
+            WHERE o.status = 'FILLED' AND p.order_id IS NULL
+            ORDER BY o.timestamp, o.order_id
+        ''').fetchall()
+        if not rows:
+            return 0
+
+        positions = {
+            symbol: [position_qty, avg_price, realized_pnl, turnover, trades]
+            for symbol, position_qty, avg_price, realized_pnl, turnover, trades
+            in conn.execute("SELECT symbol, position_qty, avg_price, realized_pnl, turnover, trades FROM symbol_pnl")
+        }
+        daily = {}
+        processed = []
+        # Symbols with an unpriced fill; their later fills wait so average cost is built in order
+        pending = set()
+        for order_id, symbol, side, quantity, price, timestamp in rows:
+            if symbol in pending:
+                continue
+            if not price or not quantity:
+                # Not valued yet: stays pending until sync_orders() records its fill price
+                pending.add(symbol)
+                continue
+            processed.append((order_id,))
+            pos = positions.setdefault(symbol, [0.0, 0.0, 0.0, 0.0, 0])
+            realized = self._apply_fill(pos, quantity if side == 'BUY' else -quantity, price)
+            notional = quantity * price
+            pos[3] += notional
+            pos[4] += 1
+
+            day = _parse_ts(timestamp).date().isoformat()
+            stats = daily.setdefault(day, [0, 0.0, 0.0])  # trades, turnover, realized
+            stats[0] += 1
+            stats[1] += notional
+            stats[2] += realized
+
+        conn.executemany('''
+            INSERT OR REPLACE INTO symbol_pnl (symbol, position_qty, avg_price, realized_pnl, turnover, trades)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(symbol, *pos) for symbol, pos in positions.items()])
+        conn.executemany('''
+            INSERT INTO daily_stats (day, trades, turnover, realized_pnl) VALUES (?, ?, ?, ?)
+            ON CONFLICT(day) DO UPDATE SET
+                trades = daily_stats.trades + excluded.trades,
+                turnover = daily_stats.turnover + excluded.turnover,
+                realized_pnl = daily_stats.realized_pnl + excluded.realized_pnl
+        ''', [(day, *stats) for day, stats in daily.items()])
+        conn.executemany("INSERT OR IGNORE INTO analytics_processed_orders (order_id) VALUES (?)", processed)
+        return len(processed)
+
+    @staticmethod
+    def _apply_fill(pos, signed_qty, price):
+        """Updates [qty, avg_price, realized, ...] in place for one fill and returns the PnL it realized."""
+        qty, avg_price = pos[0], pos[1]
+        realized = 0.0
+        if qty == 0 or (qty > 0) == (signed_qty > 0):
+            # Opening or adding to a position
+            new_qty = qty + signed_qty
+            pos[1] = (abs(qty) * avg_price + abs(signed_qty) * price) / abs(new_qty)
+            pos[0] = new_qty
+        else:
+            # Reducing, closing or flipping
+            closed = min(abs(signed_qty), abs(qty))
+            realized = closed * (price - avg_price) * (1 if qty > 0 else -1)
+            new_qty = qty + signed_qty
+            if new_qty == 0:
+                pos[1] = 0.0
+            elif (new_qty > 0) != (qty > 0):
+                pos[1] = price
+            pos[0] = new_qty
+        pos[2] += realized
+        return realized
+
+    # --- Queries (all served from the rollup tables) ---
+
+    def equity_curve(self, start=None, end=None, asset='USDT'):
+        """Returns [(cycle_ts, equity), ...] ordered by time."""
+        sql = "SELECT cycle_ts, equity FROM equity_cycles WHERE asset = ?"
+        params = [asset]
+        if start:
+            sql += " AND cycle_ts >= ?"
+            params.append(start.strftime(TIMESTAMP_FORMAT) if isinstance(start, datetime) else start)
+        if end:
+            sql += " AND cycle_ts < ?"
+            params.append(end.strftime(TIMESTAMP_FORMAT) if isinstance(end, datetime) else end)
+        sql += " ORDER BY cycle_ts"
+        return self.db.conn.execute(sql, params).fetchall()
+
+    def drawdown(self, start=None, end=None, asset='USDT'):
+        """Returns (max_drawdown, current_drawdown) as fractions of the running equity peak."""
+        peak = None
+        max_dd = 0.0
+        current_dd = 0.0
+        for _, equity in self.equity_curve(start, end, asset):
+            if peak is None or equity > peak:
+                peak = equity
+            current_dd = (peak - equity) / peak if peak > 0 else 0.0
+            max_dd = max(max_dd, current_dd)
+        return max_dd, current_dd
+
+    def symbol_pnl(self, symbol=None):
+        """Returns realized PnL, open position and turnover per symbol."""
+        sql = "SELECT symbol, realized_pnl, position_qty, avg_price, turnover, trades FROM symbol_pnl"
+        params = ()
+        if symbol:
+            sql += " WHERE symbol = ?"
+            params = (symbol,)
+        sql += " ORDER BY realized_pnl DESC"
+        return self.db.conn.execute(sql, params).fetchall()
+
+    def daily_stats(self, start=None, end=None):
+        """Returns [(day, trades, turnover, realized_pnl, open, close, high, low), ...]."""
+        sql = '''
+            SELECT day, trades, turnover, realized_pnl, open_equity, close_equity, high_equity, low_equity
+            FROM daily_stats WHERE 1 = 1
+        '''
+        params = []
+        if start:
+            sql += " AND day >= ?"
+            params.append(str(start))
+        if end:
+            sql += " AND day < ?"
+            params.append(str(end))
+        sql += " ORDER BY day"
+        return self.db.conn.execute(sql, params).fetchall()
+
+    def turnover(self, start=None, end=None):
+        """Total traded notional between two days (inclusive start, exclusive end)."""
+        return sum(row[2] for row in self.daily_stats(start, end))
+
+    # --- Retention ---
+
+    def compact(self, retain_days=90):
+        """
+        Deletes raw rows older than retain_days that are already reflected in the rollups.
+        Only finalized orders are removed; open orders are always kept for sync_state.
+        """
+        self.refresh()
+        cutoff = (datetime.utcnow() - timedelta(days=retain_days)).strftime(TIMESTAMP_FORMAT)
+        conn = self.db.conn
+        try:
+            with conn:
+                last_id = self._get_state('balance_history_last_id')
+                balances = conn.execute(
+                    "DELETE FROM balance_history WHERE timestamp < ? AND id <= ?", (cutoff, last_id)
+                ).rowcount
+                placeholders = ', '.join('?' for _ in FINAL_ORDER_STATUSES)
+                orders = conn.execute(f'''
+                    DELETE FROM orders WHERE timestamp < ? AND status IN ({placeholders})
+                    AND (status != 'FILLED' OR order_id IN (SELECT order_id FROM analytics_processed_orders))
+                ''', (cutoff, *FINAL_ORDER_STATUSES)).rowcount
+                conn.execute(
+                    "DELETE FROM analytics_processed_orders WHERE order_id NOT IN (SELECT order_id FROM orders)"
+                )
+            print(f"Analytics: compacted {balances} balance rows and {orders} orders older than {retain_days} days.")
+            return balances, orders
+        except Exception as e:
+            print(f"Analytics Error compacting: {e}")
+            return 0, 0
+
+
+if __name__ == '__main__':
+    analytics = Analytics(Database())
+    print(analytics.refresh())
+    print(analytics.equity_curve()[-10:])
+    print(analytics.drawdown())
+    print(analytics.symbol_pnl())
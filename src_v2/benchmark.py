@@ -0,0 +1,384 @@
+"""
+Offline benchmark suite for the data-to-decision pipeline.
+
+Runs against synthetic klines/funding (no network), times and memory-profiles each
+stage and writes the results to JSON so runs can be compared between commits:
+
+    python benchmark.py                          # quick grid
+    python benchmark.py --symbols 10 100 500 --months 2 60
+    python benchmark.py --compare bench_results/<old>.json
+    python benchmark.py --memory-mode bounded --cycles 500   # RSS over a long simulated run
+"""
+import os
+import gc
+import sys
+import json
+import time
+import zlib
+import pickle as pkl
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime, timedelta
+import numpy as np
+
+import data_ingestion as data_ingestion_module
+from data_ingestion import DataIngestion
+from model import Classifier
+from trading_utils import TradingPrice
+from database_orm import Database
+from timeframes import Timeframe
+from memory import rss_bytes, release_memory
+
+BAR_MS = 4 * 60 * 60 * 1000
+FUNDING_MS = 8 * 60 * 60 * 1000
+BARS_PER_MONTH = 30 * 6
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'best_random_forest_model.pkl')
+
+
+# --- Synthetic data ---
+
+def synthetic_klines(n_bars, seed=0, end=None):
+    """Binance-format 4H klines (strings for prices, like the REST API) from a geometric random walk."""
+    rng = np.random.default_rng(seed)
+    end = end or datetime(2025, 1, 1)
+    end_ms = int((end - datetime(1970, 1, 1)).total_seconds() * 1000)
+    end_ms -= end_ms % BAR_MS
+    open_times = end_ms - BAR_MS * np.arange(n_bars - 1, -1, -1, dtype=np.int64)
+
+    returns = rng.normal(0, 0.02, n_bars)
+    close = 100.0 * np.exp(np.cumsum(returns))
+    open_ = np.concatenate(([100.0], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.01, n_bars)) * close
+    high = np.maximum(open_, close) + spread
+    low = np.minimum(open_, close) - spread
+    volume = rng.lognormal(10, 0.5, n_bars)
+
+    return [
+        [int(t), f"{o:.4f}", f"{h:.4f}", f"{l:.4f}", f"{c:.4f}", f"{v:.4f}",
+         int(t) + BAR_MS - 1, f"{v * c:.4f}", 1000, f"{v / 2:.4f}", f"{v * c / 2:.4f}", "0"]
+        for t, o, h, l, c, v in zip(open_times, open_, high, low, close, volume)
+    ]
+
+
+def synthetic_funding(symbol, start_ms, end_ms, seed=0):
+    """Binance-format funding records every 8H between start_ms and end_ms."""
+    rng = np.random.default_rng(seed + 1)
+    start_ms = int(start_ms) - int(start_ms) % FUNDING_MS
+    times = np.arange(start_ms, int(end_ms) + 1, FUNDING_MS, dtype=np.int64)
+    rates = rng.normal(0.0001, 0.0002, len(times))
+    return [
+        {'symbol': symbol, 'fundingTime': int(t), 'fundingRate': f"{r:.8f}"}
+        for t, r in zip(times, rates)
+    ]
+
+
+class SyntheticClient:
+    """
+    Stands in for binance Client in DataIngestion, serving synthetic klines.
+    `extra_bars` more candles are generated up front and released one per cycle by advancing `cursor`.
+    """
+    def __init__(self, n_bars, extra_bars=0, end=None):
+        self.n_bars = n_bars
+        self.extra_bars = extra_bars
+        self.end = end
+        self.cursor = 0
+        self._cache = {}
+
+    def _released(self, symbol):
+        if symbol not in self._cache:
+            self._cache[symbol] = synthetic_klines(
+                self.n_bars + self.extra_bars, seed=zlib.crc32(symbol.encode()), end=self.end
+            )
+        return self._cache[symbol][:self.n_bars + self.cursor]
+
+    def get_historical_klines(self, symbol, interval, start_str, end_str=None):
+        return self._released(symbol)[-self.n_bars:]
+
+    def get_klines(self, symbol, interval, startTime, limit=500):
+        return [k for k in self._released(symbol) if k[0] >= startTime][:limit]
+
+
+
+class SyntheticFunding:
+    """
+    Stands in for data_ingestion.fetch_funding_history. Each symbol's records cover its
+    whole SyntheticClient history and are generated once, outside the timed regions;
+    calls only slice the cached list.
+    """
+    def __init__(self, client):
+        self.client = client
+        self._cache = {}
+
+    def __call__(self, symbol, start_ts, end_ts):
+        cached = self._cache.get(symbol)
+        if cached is None:
+            self.client._released(symbol)
+            klines = self.client._cache[symbol]
+            records = synthetic_funding(symbol, klines[0][0], klines[-1][0], seed=zlib.crc32(symbol.encode()))
+            cached = self._cache[symbol] = (np.array([r['fundingTime'] for r in records], dtype=np.int64), records)
+        times, records = cached
+        lo = int(np.searchsorted(times, int(start_ts), side='left'))
+        hi = int(np.searchsorted(times, int(end_ts), side='right'))
+        return records[lo:hi]
+
+
+def synthetic_symbols(n):
+    return [f"SYN{i:03d}USDT" for i in range(n)]
+
+
+# --- Harness ---
+
+def measure(func, repeat):
+    """Runs func `repeat` times; returns timings plus the tracemalloc peak of one extra run."""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'seconds_min': min(timings),
+        'seconds_median': statistics.median(timings),
+        'peak_mem_bytes': peak
+    }
+
+
+def load_model(feature_frame):
+    """The shipped model when it is available, otherwise a forest of the same kind fitted on synthetic labels."""
+    classifier = Classifier.__new__(Classifier)
+    try:
+        with open(MODEL_PATH, 'rb') as file:
+            classifier.model = pkl.load(file=file)
+        return classifier, 'shipped'
+    except Exception:
+        from sklearn.ensemble import RandomForestClassifier
+        rng = np.random.default_rng(0)
+        model = RandomForestClassifier(n_estimators=200, max_depth=8, random_state=0)
+        model.fit(feature_frame, rng.integers(0, 5, len(feature_frame)))
+        classifier.model = model
+        return classifier, 'synthetic'
+
+
+def run_grid(symbol_counts, month_counts, repeat, memory_mode=None):
+    results = []
+    original_fetch_funding = data_ingestion_module.fetch_funding_history
+    try:
+        for months in month_counts:
+            n_bars = months * BARS_PER_MONTH
+            client = SyntheticClient(n_bars)
+            data_ingestion_module.fetch_funding_history = SyntheticFunding(client)
+            ingestion = DataIngestion(timeframe=Timeframe('4h'), source='native',
+                                      client=client, memory_mode=memory_mode)
+
+            for n_symbols in symbol_counts:
+                symbols = synthetic_symbols(n_symbols)
+                case = {'symbols': n_symbols, 'months': months, 'bars': n_bars}
+                print(f"Benchmarking {n_symbols} symbols x {n_bars} bars...")
+
+                # Untimed first pass: also generates and caches every symbol's klines and funding
+                frames = {symbol: ingestion.get_data(symbol) for symbol in symbols}
+                features = {symbol: ingestion.__engineer_features__(df.copy()) for symbol, df in frames.items()}
+                model, model_source = load_model(next(iter(features.values())))
+                trading_price = TradingPrice()
+                probs = {symbol: model.predict(f) for symbol, f in features.items()}
+
+                def bench_get_data():
+                    for symbol in symbols:
+                        ingestion.get_data(symbol)
+
+                def bench_features():
+                    for df in frames.values():
+                        ingestion.__engineer_features__(df.copy())
+
+                def bench_predict():
+                    for f in features.values():
+                        model.predict(f)
+
+                def bench_decision():
+                    for p in probs.values():
+                        trading_price.get_trade_decision(trading_price.calculate_edge(p))
+
+                benches = [
+                    ('get_data', bench_get_data),
+                    ('engineer_features', bench_features),
+                    ('predict', bench_predict),
+                    ('decision', bench_decision),
+                ]
+                for name, func in benches:
+                    entry = dict(case, benchmark=name)
+                    if name == 'predict':
+                        entry['model'] = model_source
+                    try:
+                        entry.update(measure(func, repeat))
+                    except Exception as e:
+                        entry['error'] = str(e)
+                    results.append(entry)
+
+        for n_symbols in symbol_counts:
+            results.append(dict(
+                {'symbols': n_symbols, 'benchmark': 'db_writes'},
+                **bench_db_writes(n_symbols, repeat)
+            ))
+    finally:
+        data_ingestion_module.fetch_funding_history = original_fetch_funding
+    return results
+
+
+def bench_long_run(n_symbols, cycles, memory_mode=None):
+    """
+    RSS across `cycles` simulated 4H cycles: warm-up, one new candle, latest fetch and
+    features for every symbol. In a bounded run RSS should stop growing after the first cycles.
+    """
+    original_fetch_funding = data_ingestion_module.fetch_funding_history
+    try:
+        client = SyntheticClient(
+            2 * BARS_PER_MONTH, extra_bars=cycles,
+            end=datetime.utcnow() + timedelta(milliseconds=BAR_MS * cycles)
+        )
+        data_ingestion_module.fetch_funding_history = SyntheticFunding(client)
+        ingestion = DataIngestion(timeframe=Timeframe('4h'), source='native', client=client, memory_mode=memory_mode)
+        symbols = synthetic_symbols(n_symbols)
+        rss = []
+        for cycle in range(cycles):
+            for symbol in symbols:
+                ingestion.prefetch(symbol)
+            client.cursor = cycle + 1
+            for symbol in symbols:
+                ingestion.__engineer_features__(ingestion.get_latest(symbol))
+            if ingestion.memory_mode == 'bounded':
+                release_memory()
+            rss.append(rss_bytes())
+    finally:
+        data_ingestion_module.fetch_funding_history = original_fetch_funding
+
+    # The first tenth is warm-up: caches, buffers and the allocator's arenas filling up
+    settled = rss[len(rss) // 10]
+    return {
+        'symbols': n_symbols,
+        'benchmark': 'long_run',
+        'memory_mode': ingestion.memory_mode,
+        'cycles': cycles,
+        'rss_settled_bytes': settled,
+        'rss_end_bytes': rss[-1],
+        'rss_max_bytes': max(rss),
+        'rss_growth_bytes': rss[-1] - settled,
+    }
+
+
+def bench_db_writes(n_symbols, repeat):
+    """One cycle's worth of writes: an entry order and a balance row per symbol, then a durable flush."""
+    orders = [
+        {'orderId': i, 'symbol': symbol, 'side': 'BUY', 'type': 'MARKET',
+         'origQty': '1.0', 'price': '0', 'avgPrice': '100.0', 'status': 'NEW'}
+        for i, symbol in enumerate(synthetic_symbols(n_symbols))
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'bench.db'))
+        devnull = open(os.devnull, 'w')
+        stdout, sys.stdout = sys.stdout, devnull  # log_order prints per order
+
+        def write_cycle():
+            for order in orders:
+                db.log_order(order, 4)
+                db.log_balance(order['symbol'], 100.0, 0.0)
+            db.flush()
+
+        try:
+            return measure(write_cycle, repeat)
+        except Exception as e:
+            return {'error': str(e)}
+        finally:
+            sys.stdout = stdout
+            devnull.close()
+            db.close()
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except Exception:
+        return 'unknown'
+
+
+def compare(current, baseline_path):
+    """Prints the median time ratio against a previous results file for each matching case."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    def key(entry):
+        return entry['benchmark'], entry.get('symbols'), entry.get('bars')
+
+    old = {key(e): e for e in baseline['results'] if 'seconds_median' in e}
+    print(f"\nCompared to {baseline.get('commit')} ({baseline_path}):")
+    for entry in current['results']:
+        previous = old.get(key(entry))
+        if previous is None or 'seconds_median' not in entry:
+            continue
+        ratio = entry['seconds_median'] / previous['seconds_median'] if previous['seconds_median'] else float('inf')
+        flag = '  REGRESSION' if ratio > 1.10 else ''
+        print(f"  {entry['benchmark']:<18} {entry.get('symbols', ''):>4} sym {entry.get('bars', ''):>6} bars  x{ratio:.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the CryptoV2 pipeline.")
+    parser.add_argument('--symbols', type=int, nargs='+', default=[10, 100])
+    parser.add_argument('--months', type=int, nargs='+', default=[2, 12])
+    parser.add_argument('--full', action='store_true', help="10-500 symbols, 2 months to 5 years")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=None, help="defaults to bench_results/<commit>.json")
+    parser.add_argument('--compare', default=None, help="previous results file to compare against")
+    parser.add_argument('--memory-mode', default=None, choices=['standard', 'bounded'],
+                        help="defaults to memory_mode from the environment")
+    parser.add_argument('--cycles', type=int, default=0, help="also simulate this many cycles and track RSS")
+    args = parser.parse_args()
+
+    if args.full:
+        args.symbols = [10, 50, 100, 250, 500]
+        args.months = [2, 12, 60]
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'memory_mode': args.memory_mode or data_ingestion_module.default_memory_mode,
+        'results': run_grid(args.symbols, args.months, args.repeat, args.memory_mode)
+    }
+    if args.cycles:
+        report['results'].append(bench_long_run(max(args.symbols), args.cycles, args.memory_mode))
+
+    output = args.output or os.path.join('bench_results', f"{commit}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for entry in report['results']:
+        if 'error' in entry:
+            print(f"{entry['benchmark']:<18} {entry.get('symbols', ''):>4} sym  ERROR {entry['error']}")
+        elif entry['benchmark'] == 'long_run':
+            print(f"{entry['benchmark']:<18} {entry['symbols']:>4} sym {entry['cycles']:>6} cycles "
+                  f"RSS {entry['rss_settled_bytes'] / 2**20:.1f} -> {entry['rss_end_bytes'] / 2**20:.1f} MB "
+                  f"({entry['memory_mode']})")
+        else:
+            print(f"{entry['benchmark']:<18} {entry.get('symbols', ''):>4} sym {entry.get('bars', ''):>6} bars  "
+                  f"{entry['seconds_median'] * 1000:10.1f} ms  peak {entry['peak_mem_bytes'] / 1e6:8.1f} MB")
+    print(f"Results written to {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
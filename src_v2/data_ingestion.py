@@ -1,13 +1,17 @@
-from binance import Client
 import pandas as pd 
 import numpy as np
 import pickle as pkl
-from env import api_key , secret_key
+from env import strategy_interval , bar_source
+from env import memory_mode as default_memory_mode
 import json
 from dateutil.relativedelta import relativedelta
 import time
-import requests
 from datetime import datetime
+from metrics import metrics
+from exchange import get_client, scheduled_get
+from timeframes import Timeframe, BarStore
+from ring_buffer import SymbolHistory
+from features import FeatureEngine, FEATURE_COLUMNS, TREND_REGIME_CODES, VOL_REGIME_CODES
 BASE_URL = "https://api.binance.com"
 
 def fetch_historical_klines(symbol, interval, start_str, end_str=None):
@@ -26,7 +30,9 @@ def fetch_funding_history(symbol, start_ts, end_ts):
             "limit": 1000
         }
         try:
-            r = requests.get(url, params=params)
+            with metrics.timer('exchange_request_seconds', endpoint='fundingRate', symbol=symbol):
+                r = scheduled_get(url, params=params, api='futures')
+            metrics.record_used_weight(r.headers, endpoint='fundingRate', api='futures', url=url)
             data = r.json()
             
             if not data:
@@ -40,8 +46,6 @@ def fetch_funding_history(symbol, start_ts, end_ts):
                 break
             current_start = last_timestamp + 1
             
-            time.sleep(0.1) # Respect rate limits
-            
         except Exception as e:
             print(f"Error fetching {symbol}: {e}")
             break
@@ -49,34 +53,49 @@ def fetch_funding_history(symbol, start_ts, end_ts):
     return all_funding
 
 
+KLINE_COLUMNS = [
+    "Open time", "Open", "High", "Low", "Close", "Volume",
+    "Close time", "Quote asset volume", "Number of trades",
+    "Taker buy base asset volume", "Taker buy quote asset volume", "Ignore"
+]
+
+
+HISTORY_MONTHS = 2
+
+
 class DataIngestion:
-    def __init__(self):
-        self.client = Client(api_key=api_key, api_secret=secret_key)  # Initialize with your API key and secret if needed
-    def get_data(self , symbol):
-        forma = "1 Jan, 2018"
-        start_str = (datetime.now() - relativedelta(months=2)).strftime("%d %b, %Y")
-        interval = Client.KLINE_INTERVAL_4HOUR
-        klines = self.client.get_historical_klines(symbol, interval, start_str)
-        all_dfs = []
+    def __init__(self, timeframe=None, source=None, client=None, memory_mode=None):
+        # Created on first use so constructing DataIngestion never touches the network
+        self._client = client
+        self.timeframe = timeframe or Timeframe(strategy_interval)
+        # "native" fetches klines at the strategy interval, "base" resamples a local 1m store
+        self.source = source or bar_source
+        # Per-symbol raw klines/funding loaded ahead of the candle close by prefetch()
+        self._history = {}
+        self.bar_store = BarStore(max_minutes=(HISTORY_MONTHS * 31 + 1) * 24 * 60)
+        self._funding = {}
+        # "bounded": fixed-size ring buffers per symbol and a reusable feature engine
+        self.memory_mode = memory_mode or default_memory_mode
+        self.history_bars = (HISTORY_MONTHS * 31 * 24 * 60) // self.timeframe.minutes + 1
+        self._rings = {}
+        self.features = FeatureEngine(self.history_bars) if self.memory_mode == 'bounded' else None
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = get_client('market_data')
+        return self._client
+    def _klines_to_frame(self, klines, symbol):
         # Process data into DataFrame
-        df_temp = pd.DataFrame(klines, columns=[
-            "Open time", "Open", "High", "Low", "Close", "Volume",
-            "Close time", "Quote asset volume", "Number of trades",
-            "Taker buy base asset volume", "Taker buy quote asset volume", "Ignore"
-        ])
+        df_temp = pd.DataFrame(klines, columns=KLINE_COLUMNS)
         # Convert types
         df_temp["Open time"] = pd.to_datetime(df_temp["Open time"], unit="ms")
         numeric_cols = ["Open", "High", "Low", "Close", "Volume"]
         df_temp[numeric_cols] = df_temp[numeric_cols].apply(pd.to_numeric, axis=1)
-        
+
         # Add symbol identifier
         df_temp['symbol'] = symbol
-        
-        all_dfs.append(df_temp)
-        df_wrapper = pd.concat(all_dfs, ignore_index=True)
-        df = df_wrapper
-        start_ms = df['Open time'].min().timestamp() * 1000
-        end_ms = df['Open time'].max().timestamp() * 1000
+        return df_temp
+    def _fetch_funding_frame(self, symbol, start_ms, end_ms):
         rates = fetch_funding_history(symbol, start_ms, end_ms)
         funding_records = [ ]
         for r in rates:
@@ -86,11 +105,13 @@ class DataIngestion:
                 'funding_rate': r['fundingRate']
             })
         df_funding = pd.DataFrame(funding_records)
-# Only try to process if we actually got data
         if not df_funding.empty:
             df_funding['Open time'] = pd.to_datetime(df_funding['Open time'], unit='ms')
             df_funding['funding_rate'] = pd.to_numeric(df_funding['funding_rate'])
-
+        return df_funding
+    def _merge_funding(self, df, df_funding):
+        # Only try to process if we actually got data
+        if not df_funding.empty:
             # 6. Merge with main DataFrame
             # Left join ensures we keep all your original candles
             df = df.merge(df_funding, on=['symbol', 'Open time'], how='left')
@@ -100,41 +121,153 @@ class DataIngestion:
             # The invalid .fillna() is removed.
             df['funding_rate'] = df.groupby('symbol')['funding_rate'].ffill()
         return df
+    def _extend_funding(self, symbol, df_funding, df):
+        """Fetches only the funding rows newer than df_funding, up to the last candle in df."""
+        if df_funding is None or df_funding.empty:
+            funding_start_ms = df['Open time'].min().timestamp() * 1000
+        else:
+            funding_start_ms = df_funding['Open time'].max().timestamp() * 1000 + 1
+        end_ms = df['Open time'].max().timestamp() * 1000
+        df_funding_new = self._fetch_funding_frame(symbol, funding_start_ms, end_ms)
+        if df_funding is None or df_funding.empty:
+            return df_funding_new
+        if not df_funding_new.empty:
+            df_funding = pd.concat([df_funding, df_funding_new], ignore_index=True)
+        return df_funding
+    def _update_base(self, symbol):
+        """Appends the 1m bars since the last stored minute (the full history on first use)."""
+        last_open = self.bar_store.last_open_time(symbol)
+        if last_open is None:
+            start = (datetime.now() - relativedelta(months=HISTORY_MONTHS)).strftime("%d %b, %Y")
+        else:
+            start = last_open
+        klines = self.client.get_historical_klines(symbol, '1m', start)
+        self.bar_store.append(symbol, klines)
+    def get_resampled(self, symbol, timeframe=None):
+        """
+        Same frame as get_data(), built from the local 1m store resampled to `timeframe`.
+        Any number of timeframes share one set of 1m fetches.
+        """
+        self._update_base(symbol)
+        bars = self.bar_store.resample(symbol, timeframe or self.timeframe)
+        df = pd.DataFrame({
+            'Open time': pd.to_datetime(bars['open_time'], unit='ms'),
+            'Open': bars['open'],
+            'High': bars['high'],
+            'Low': bars['low'],
+            'Close': bars['close'],
+            'Volume': bars['volume'],
+        })
+        df['symbol'] = symbol
+        if df.empty:
+            return df
+        self._funding[symbol] = self._extend_funding(symbol, self._funding.get(symbol), df)
+        return self._merge_funding(df, self._funding[symbol])
+    def _update_ring(self, symbol):
+        """
+        Bounded mode: tops up the symbol's ring buffers with the candles and funding rates
+        since the last stored ones (the full history on first use or after a long gap).
+        """
+        ring = self._rings.get(symbol)
+        if ring is None:
+            # Funding settles at most hourly, so one slot per hour of history is always enough
+            funding_slots = self.history_bars * self.timeframe.minutes // 60 + 8
+            ring = self._rings[symbol] = SymbolHistory(symbol, self.history_bars, funding_slots)
+        last_open = ring.last_open_time()
+        now_ms = time.time() * 1000
+        if last_open is None or now_ms - last_open > 1000 * self.timeframe.period_ms:
+            ring.clear()
+            start_str = (datetime.now() - relativedelta(months=HISTORY_MONTHS)).strftime("%d %b, %Y")
+            klines = self.client.get_historical_klines(symbol, self.timeframe.interval, start_str)
+        else:
+            # The last stored candle may still have been forming, re-fetch from there
+            klines = self.client.get_klines(
+                symbol=symbol,
+                interval=self.timeframe.interval,
+                startTime=last_open,
+                limit=1000
+            )
+        ring.add_klines(klines)
+        if len(ring.bars) == 0:
+            return ring
+        last_funding = ring.last_funding_time()
+        start_ms = int(ring.bars.view('open_time')[0]) if last_funding is None else last_funding + 1
+        ring.add_funding(fetch_funding_history(symbol, start_ms, ring.last_open_time()))
+        return ring
+    def memory_nbytes(self):
+        """Bytes held by the bounded-mode ring buffers and feature scratch buffers."""
+        total = sum(ring.nbytes for ring in self._rings.values())
+        return total + (self.features.nbytes if self.features is not None else 0)
+    def get_data(self , symbol):
+        if self.source == 'base':
+            return self.get_resampled(symbol)
+        forma = "1 Jan, 2018"
+        start_str = (datetime.now() - relativedelta(months=HISTORY_MONTHS)).strftime("%d %b, %Y")
+        interval = self.timeframe.interval
+        klines = self.client.get_historical_klines(symbol, interval, start_str)
+        df = self._klines_to_frame(klines, symbol)
+        start_ms = df['Open time'].min().timestamp() * 1000
+        end_ms = df['Open time'].max().timestamp() * 1000
+        df_funding = self._fetch_funding_frame(symbol, start_ms, end_ms)
+        return self._merge_funding(df, df_funding)
+    def prefetch(self, symbol):
+        """
+        Loads the full history (klines + funding) ahead of the candle close so that
+        get_latest() only has to fetch the final candle afterwards.
+        """
+        if self.source == 'base':
+            self._update_base(symbol)
+            return self.bar_store.last_open_time(symbol) is not None
+        if self.memory_mode == 'bounded':
+            return len(self._update_ring(symbol).bars) > 0
+        start_str = (datetime.now() - relativedelta(months=HISTORY_MONTHS)).strftime("%d %b, %Y")
+        klines = self.client.get_historical_klines(symbol, self.timeframe.interval, start_str)
+        df = self._klines_to_frame(klines, symbol)
+        if df.empty:
+            self._history.pop(symbol, None)
+            return False
+        start_ms = df['Open time'].min().timestamp() * 1000
+        end_ms = df['Open time'].max().timestamp() * 1000
+        self._history[symbol] = {
+            'klines': df,
+            'funding': self._fetch_funding_frame(symbol, start_ms, end_ms)
+        }
+        return True
+    def get_latest(self, symbol):
+        """
+        Returns the same frame as get_data(), folding only the candles that changed
+        since prefetch() into the cached history. Falls back to a full fetch when cold.
+        """
+        if self.source == 'base':
+            return self.get_resampled(symbol)
+        if self.memory_mode == 'bounded':
+            return self._update_ring(symbol).frame()
+        cached = self._history.get(symbol)
+        if cached is None:
+            return self.get_data(symbol)
+
+        df = cached['klines']
+        # The last cached candle was still forming at prefetch time, re-fetch from there
+        last_open = df['Open time'].iloc[-1]
+        klines = self.client.get_klines(
+            symbol=symbol,
+            interval=self.timeframe.interval,
+            startTime=int(last_open.timestamp() * 1000),
+            limit=10
+        )
+        df_new = self._klines_to_frame(klines, symbol)
+        df = pd.concat([df[df['Open time'] < last_open], df_new], ignore_index=True)
+
+        df_funding = self._extend_funding(symbol, cached['funding'], df)
+
+        cached['klines'] = df
+        cached['funding'] = df_funding
+        return self._merge_funding(df, df_funding)
     def __engineer_features__(self , df : pd.DataFrame) -> pd.DataFrame:
-        feature_list = ['log_average',
-                        'vol_10',
-                        'vol_20',
-                        'vol_40',
-                        'vol_ratio',
-                        'true_range',
-                        'norm_range',
-                        'atr_14',
-                        'range_ratio',
-                        'vol_rel',
-                        'vol_z',
-                        'abs_r_x_vol',
-                        'sum_r_6',
-                        'ema_diff',
-                        'hour_sin',
-                        'hour_cos',
-                        'day_sin',
-                        'day_cos',
-                        'ret_lag_1',
-                        'vol_lag_1',
-                        'ret_lag_2',
-                        'vol_lag_2',
-                        'ret_lag_3',
-                        'vol_lag_3',
-                        'ret_lag_5',
-                        'vol_lag_5',
-                        'ret_skew_20',
-                        'ret_kurt_20',
-                        'ret_autocorr_20',
-                        'funding_z',
-                        'funding_x_ret',
-                        'funding_delta',
-                        'trend_regime_code',
-                        'vol_regime_code']
+        if self.features is not None:
+            # Bounded mode: same features, computed into reused buffers without helper columns
+            return self.features.compute(df)
+        feature_list = FEATURE_COLUMNS
         df['funding_z'] = df.groupby('symbol')['funding_rate'].transform(
                                                                            lambda x: (x - x.rolling(200).mean()) / x.rolling(200).std()
                                                                         )
@@ -221,8 +354,9 @@ class DataIngestion:
             lambda x: x.rolling(window=20).corr(x.shift(1))
         )
         df_model = df.dropna().copy()
-        df_model['trend_regime_code'] = df_model['trend_regime'].astype('category').cat.codes
-        df_model['vol_regime_code'] = df_model['vol_regime'].astype('category').cat.codes
+        # Fixed codes: category codes would shift whenever a label is missing from the window
+        df_model['trend_regime_code'] = df_model['trend_regime'].map(TREND_REGIME_CODES).astype(np.int8)
+        df_model['vol_regime_code'] = df_model['vol_regime'].map(VOL_REGIME_CODES).astype(np.int8)
 
         return df_model[feature_list]
 
@@ -1,17 +1,65 @@
 import sqlite3
 import json
+import time
+import queue
+import atexit
+import threading
+from itertools import groupby
 from datetime import datetime
 
+# Sentinel pushed onto the write queue to stop the background writer
+_STOP = object()
+# Longest flush() waits for the writer before giving up on pending writes
+FLUSH_TIMEOUT = 30
+
 class Database:
-    def __init__(self, db_name="crypto_trading.db"):
-        self.conn = sqlite3.connect(db_name, check_same_thread=False)
-        self.cursor = self.conn.cursor()
+    def __init__(self, db_name="crypto_trading.db", batch_size=500, flush_interval=0.05):
+        self.db_name = db_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        # One connection per thread; the writer thread owns its own
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
         self.init_db()
 
+        # Writes are queued and committed in groups by a background thread
+        self._queue = queue.Queue()
+        self._closed = False
+        # Orders enqueues against close() so nothing lands on the queue behind _STOP
+        self._enqueue_lock = threading.Lock()
+        self._writer = threading.Thread(target=self._writer_loop, name="db-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _connect(self):
+        """Open a new connection with the tuned pragmas applied."""
+        conn = sqlite3.connect(self.db_name, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-16000")  # ~16MB page cache
+        conn.execute("PRAGMA busy_timeout=5000")
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+
+    @property
+    def conn(self):
+        """Connection bound to the calling thread."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
     def init_db(self):
         """Initialize the database tables."""
+        cursor = self.conn.cursor()
         # Orders table
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE IF NOT EXISTS orders (
                 order_id INTEGER PRIMARY KEY,
                 symbol TEXT,
@@ -25,9 +73,9 @@ class Database:
                 client_order_id TEXT
             )
         ''')
-        
+
         # Balance history table
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE IF NOT EXISTS balance_history (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 asset TEXT,
@@ -36,27 +84,103 @@ class Database:
                 timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+
+        # Indexes for the status and time based queries
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_timestamp ON orders (timestamp)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_balance_history_timestamp ON balance_history (timestamp)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_balance_history_asset_timestamp ON balance_history (asset, timestamp)")
         self.conn.commit()
 
+    def _now(self):
+        # Stamped at enqueue time so batching does not skew the recorded time.
+        # Same format/timezone as sqlite's CURRENT_TIMESTAMP.
+        return datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+
+    def _enqueue(self, sql, params):
+        with self._enqueue_lock:
+            if self._closed:
+                raise RuntimeError("Database is closed")
+            self._queue.put((sql, params))
+
+    def _writer_loop(self):
+        """Drains the write queue, grouping statements into executemany calls and a single commit per batch."""
+        conn = self._connect()
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            # Keep collecting for a short window so bursts share one commit
+            try:
+                while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                    batch.append(self._queue.get(timeout=self.flush_interval))
+            except queue.Empty:
+                pass
+
+            if batch[-1] is _STOP:
+                running = False
+            writes = [item for item in batch if item is not _STOP]
+            self._write_batch(conn, writes)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write_batch(self, conn, writes):
+        if not writes:
+            return
+        try:
+            with conn:
+                # Consecutive statements with the same SQL go through executemany; order is preserved
+                for sql, group in groupby(writes, key=lambda item: item[0]):
+                    conn.executemany(sql, [params for _, params in group])
+        except Exception as e:
+            print(f"DB Error writing batch of {len(writes)} statements: {e}")
+            # Retry one by one so a single bad row does not drop the whole batch
+            for sql, params in writes:
+                try:
+                    with conn:
+                        conn.execute(sql, params)
+                except Exception as row_error:
+                    print(f"DB Error writing row: {row_error}")
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """
+        Block until every queued write has been committed. Gives up if the writer thread
+        is no longer running or `timeout` seconds pass; returns True when everything was written.
+        """
+        deadline = time.monotonic() + timeout
+        done = self._queue.all_tasks_done
+        with done:
+            while self._queue.unfinished_tasks:
+                if not self._writer.is_alive():
+                    print(f"DB Error: writer is not running, {self._queue.unfinished_tasks} writes not committed")
+                    return False
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print(f"DB Error: timed out after {timeout}s waiting for {self._queue.unfinished_tasks} writes")
+                    return False
+                done.wait(min(remaining, 0.5))
+        return True
+
     def log_order(self, order_response, leverage):
         """Log an order to the database."""
         try:
-            self.cursor.execute('''
+            self._enqueue('''
                 INSERT OR REPLACE INTO orders (
-                    order_id, symbol, side, order_type, quantity, price, leverage, status, client_order_id
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    order_id, symbol, side, order_type, quantity, price, leverage, status, timestamp, client_order_id
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 order_response['orderId'],
                 order_response['symbol'],
                 order_response['side'],
                 order_response['type'],
-                float(order_response['origQty']),
-                float(order_response.get('price', 0) or 0),
+                # Filled quantity once known (closePosition stops report origQty 0)
+                float(order_response.get('executedQty', 0) or 0) or float(order_response['origQty']),
+                # Market orders report price 0; fall back to the average fill price when present
+                float(order_response.get('price', 0) or 0) or float(order_response.get('avgPrice', 0) or 0),
                 leverage,
                 order_response['status'],
+                self._now(),
                 order_response.get('clientOrderId', '')
             ))
-            self.conn.commit()
             print(f"DB: Logged order {order_response['orderId']} for {order_response['symbol']}.")
         except Exception as e:
             print(f"DB Error logging order: {e}")
@@ -64,26 +188,68 @@ class Database:
     def update_order_status(self, order_id, status):
         """Update the status of an order."""
         try:
-            self.cursor.execute("UPDATE orders SET status = ? WHERE order_id = ?", (status, order_id))
-            self.conn.commit()
+            self._enqueue("UPDATE orders SET status = ? WHERE order_id = ?", (status, order_id))
         except Exception as e:
             print(f"DB Error updating order status: {e}")
 
+    def update_order_fill(self, order_id, status, quantity, price):
+        """Update the status plus the executed quantity and average fill price reported by the exchange."""
+        try:
+            self._enqueue('''
+                UPDATE orders SET status = ?,
+                    quantity = CASE WHEN ? > 0 THEN ? ELSE quantity END,
+                    price = CASE WHEN ? > 0 THEN ? ELSE price END
+                WHERE order_id = ?
+            ''', (status, quantity, quantity, price, price, order_id))
+        except Exception as e:
+            print(f"DB Error updating order fill: {e}")
+
+    def get_orders_to_sync(self):
+        """Orders still open locally, plus fills logged without a fill price."""
+        self.flush()
+        cursor = self.conn.execute('''
+            SELECT order_id, symbol FROM orders
+            WHERE status IN ('NEW', 'PARTIALLY_FILLED')
+               OR (status = 'FILLED' AND (price IS NULL OR price = 0))
+        ''')
+        return cursor.fetchall()
+
     def get_open_orders_local(self):
         """Get orders that are locally marked as NEW or PARTIALLY_FILLED."""
-        self.cursor.execute("SELECT order_id, symbol FROM orders WHERE status IN ('NEW', 'PARTIALLY_FILLED')")
-        return self.cursor.fetchall()
+        # Make sure pending writes are visible before reading
+        self.flush()
+        cursor = self.conn.execute("SELECT order_id, symbol FROM orders WHERE status IN ('NEW', 'PARTIALLY_FILLED')")
+        return cursor.fetchall()
 
     def log_balance(self, asset, wallet_balance, unrealized_pnl):
         """Log account balance."""
         try:
-            self.cursor.execute('''
-                INSERT INTO balance_history (asset, wallet_balance, unrealized_pnl)
-                VALUES (?, ?, ?)
-            ''', (asset, float(wallet_balance), float(unrealized_pnl)))
-            self.conn.commit()
+            self._enqueue('''
+                INSERT INTO balance_history (asset, wallet_balance, unrealized_pnl, timestamp)
+                VALUES (?, ?, ?, ?)
+            ''', (asset, float(wallet_balance), float(unrealized_pnl), self._now()))
         except Exception as e:
             print(f"DB Error logging balance: {e}")
 
     def close(self):
-        self.conn.close()
\ No newline at end of file
+        """Flush pending writes, checkpoint the WAL into the main file and close all connections."""
+        with self._enqueue_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._writer.join()
+        try:
+            conn = self.conn
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except Exception as e:
+            print(f"DB Error checkpointing on close: {e}")
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._connections = []
+        self._local = threading.local()
@@ -16,4 +16,28 @@ test_net = os.getenv("test_net", "True").lower() == "true"
 leverage_large_edge = int(os.getenv("leverage_large_edge", 8))
 leverage_small_edge = int(os.getenv("leverage_small_edge", 4))
 stop_loss_large_edge = float(os.getenv("stop_loss_large_edge", 0.0025))
-stop_loss_small_edge = float(os.getenv("stop_loss_small_edge", 0.0015))
\ No newline at end of file
+stop_loss_small_edge = float(os.getenv("stop_loss_small_edge", 0.0015))
+
+metrics_enabled = os.getenv("metrics_enabled", "False").lower() == "true"
+metrics_port = int(os.getenv("metrics_port", 0))  # 0 disables the HTTP endpoint
+metrics_jsonl_path = os.getenv("metrics_jsonl_path", "")
+
+# "top10" trades TOP_10_CRYPTOS, "coinmetrics" every coinmetrics_assets.csv asset listed on Binance futures
+universe = os.getenv("universe", "top10")
+shard_workers = int(os.getenv("shard_workers", 0))  # 0 runs the analysis in-process
+
+# Bar interval the strategy trades on; "base" resamples it from a local 1m store instead of fetching it
+strategy_interval = os.getenv("strategy_interval", "4h")
+bar_source = os.getenv("bar_source", "native")
+
+model_path = os.getenv("model_path", str(Path(__file__).resolve().parent / 'best_random_forest_model.pkl'))
+
+# Portfolio allocation: inverse_vol, erc (equal risk contribution) or edge_scaled
+allocation_method = os.getenv("allocation_method", "inverse_vol")
+max_weight = float(os.getenv("max_weight", 1.0))  # per-asset cap, fraction of deployable capital
+max_gross_exposure = float(os.getenv("max_gross_exposure", 1.0))
+min_notional = float(os.getenv("min_notional", 6))  # Binance min is usually 5-10 USDT
+min_notional_mode = os.getenv("min_notional_mode", "raise")
+
+# "bounded" keeps per-symbol history in fixed ring buffers and computes features into reused buffers
+memory_mode = os.getenv("memory_mode", "standard")
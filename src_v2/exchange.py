@@ -0,0 +1,69 @@
+import threading
+from env import api_key, secret_key, demo_futures_api, demo_futures_secret, test_net
+from metrics import instrument_client
+from rate_limiter import request_scheduler, ScheduledClient, RateLimitError, MARKET_DATA, host_of
+
+# Room for the parallel fetches in pipeline.fetch_latest plus order traffic
+POOL_SIZE = 32
+
+_clients = {}
+_session = None
+_lock = threading.Lock()
+
+
+def _pooled_adapter():
+    from requests.adapters import HTTPAdapter
+    return HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+
+
+def _build_client(kind):
+    # python-binance pulls in a large dependency tree; only pay for it on first use
+    from binance.client import Client
+    if kind == 'trading':
+        client = Client(demo_futures_api, demo_futures_secret, testnet=test_net, ping=False)
+    elif kind == 'market_data':
+        client = Client(api_key=api_key, api_secret=secret_key, ping=False)
+    else:
+        raise ValueError(f"Unknown client kind: {kind}")
+    client.session.mount('https://', _pooled_adapter())
+    return ScheduledClient(instrument_client(client), request_scheduler)
+
+
+def get_client(kind='trading'):
+    """
+    Process-wide Binance client, created on first use without the constructor ping.
+    'trading' uses the futures (demo/testnet) keys, 'market_data' the main keys used for klines.
+    """
+    with _lock:
+        client = _clients.get(kind)
+        if client is None:
+            client = _clients[kind] = _build_client(kind)
+        return client
+
+
+def get_session():
+    """Shared pooled requests session for the REST calls made outside python-binance."""
+    global _session
+    with _lock:
+        if _session is None:
+            import requests
+            _session = requests.Session()
+            _session.mount('https://', _pooled_adapter())
+        return _session
+
+
+def scheduled_get(url, params=None, api='futures', weight=1, priority=MARKET_DATA):
+    """GET through the shared session and the global request scheduler. Returns the response."""
+    session = get_session()
+    state = {}
+
+    def call():
+        response = session.get(url, params=params)
+        state['headers'] = response.headers
+        if response.status_code in (429, 418):
+            raise RateLimitError(response.status_code, response.headers.get('Retry-After'))
+        return response
+
+    return request_scheduler.execute(
+        call, api, weight, priority, response_headers=lambda: state.get('headers'), host=host_of(url)
+    )
@@ -0,0 +1,245 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+FEATURE_COLUMNS = ['log_average',
+                   'vol_10',
+                   'vol_20',
+                   'vol_40',
+                   'vol_ratio',
+                   'true_range',
+                   'norm_range',
+                   'atr_14',
+                   'range_ratio',
+                   'vol_rel',
+                   'vol_z',
+                   'abs_r_x_vol',
+                   'sum_r_6',
+                   'ema_diff',
+                   'hour_sin',
+                   'hour_cos',
+                   'day_sin',
+                   'day_cos',
+                   'ret_lag_1',
+                   'vol_lag_1',
+                   'ret_lag_2',
+                   'vol_lag_2',
+                   'ret_lag_3',
+                   'vol_lag_3',
+                   'ret_lag_5',
+                   'vol_lag_5',
+                   'ret_skew_20',
+                   'ret_kurt_20',
+                   'ret_autocorr_20',
+                   'funding_z',
+                   'funding_x_ret',
+                   'funding_delta',
+                   'trend_regime_code',
+                   'vol_regime_code']
+
+# Fixed regime codes used by both feature paths: the category codes the string labels get when every label is present
+TREND_REGIME_CODES = {'range': 0, 'trend': 1}
+VOL_REGIME_CODES = {'high': 0, 'low': 1, 'medium': 2}
+
+# Intermediate series that are not model features
+SCRATCH_COLUMNS = ('funding_rate', 'true_range_mean_20', 'vol_mean_20', 'vol_std_20',
+                   'ema_20', 'ema_50', 'hour', 'day_of_week', 'shifted')
+
+_MS_PER_HOUR = 60 * 60 * 1000
+_MS_PER_DAY = 24 * _MS_PER_HOUR
+
+
+def _shift(x, lag, out):
+    out[:lag] = np.nan
+    out[lag:] = x[:len(x) - lag]
+    return out
+
+
+def _rolling_mean(x, window, out):
+    out[:window - 1] = np.nan
+    if len(x) >= window:
+        np.mean(sliding_window_view(x, window), axis=1, out=out[window - 1:])
+    return out
+
+
+def _rolling_std(x, window, out):
+    out[:window - 1] = np.nan
+    if len(x) >= window:
+        np.std(sliding_window_view(x, window), axis=1, ddof=1, out=out[window - 1:])
+    return out
+
+
+def _rolling_sum(x, window, out):
+    out[:window - 1] = np.nan
+    if len(x) >= window:
+        np.sum(sliding_window_view(x, window), axis=1, out=out[window - 1:])
+    return out
+
+
+def _rolling_moments(x, window, skew_out, kurt_out):
+    """Bias-corrected rolling skewness and excess kurtosis, as pandas Rolling.skew()/kurt()."""
+    skew_out[:window - 1] = np.nan
+    kurt_out[:window - 1] = np.nan
+    if len(x) < window:
+        return
+    windows = sliding_window_view(x, window)
+    d = windows - windows.mean(axis=1, keepdims=True)
+    d2 = d * d
+    m2 = d2.mean(axis=1)
+    m3 = (d2 * d).mean(axis=1)
+    m4 = (d2 * d2).mean(axis=1)
+    n = float(window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        skew = np.sqrt(n * (n - 1)) * m3 / ((n - 2) * m2 ** 1.5)
+        kurt = ((n * n - 1) * m4 / (m2 * m2) - 3 * (n - 1) ** 2) / ((n - 2) * (n - 3))
+    flat = m2 <= 1e-14
+    skew[flat] = np.nan
+    kurt[flat] = np.nan
+    skew_out[window - 1:] = skew
+    kurt_out[window - 1:] = kurt
+
+
+def _rolling_corr(x, y, window, out):
+    out[:window - 1] = np.nan
+    if len(x) < window:
+        return out
+    wx = sliding_window_view(x, window)
+    wy = sliding_window_view(y, window)
+    dx = wx - wx.mean(axis=1, keepdims=True)
+    dy = wy - wy.mean(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide((dx * dy).sum(axis=1), np.sqrt((dx * dx).sum(axis=1) * (dy * dy).sum(axis=1)),
+                  out=out[window - 1:])
+    return out
+
+
+def _ema(x, span, out):
+    """x.ewm(span=span, adjust=False).mean() for a series without gaps."""
+    if len(x) == 0:
+        return out
+    alpha = 2.0 / (span + 1)
+    value = x[0]
+    for i in range(len(x)):
+        value = alpha * x[i] + (1 - alpha) * value
+        out[i] = value
+    return out
+
+
+class FeatureEngine:
+    """
+    Numpy version of DataIngestion.__engineer_features__ for the bounded-memory mode.
+    Every feature and intermediate series is written into buffers allocated once and
+    reused for every symbol and cycle; they only grow if a longer history shows up.
+    Regimes are produced directly as small integer codes.
+    """
+    def __init__(self, capacity=0):
+        self.capacity = 0
+        self._features = None
+        self._scratch = {}
+        self._mask = None
+        self._reserve(capacity)
+
+    @property
+    def nbytes(self):
+        return self._features.nbytes + self._mask.nbytes + sum(values.nbytes for values in self._scratch.values())
+
+    def _reserve(self, n):
+        if n <= self.capacity and self._features is not None:
+            return
+        self.capacity = max(n, self.capacity)
+        self._features = np.empty((len(FEATURE_COLUMNS), self.capacity), dtype=np.float64)
+        self._scratch = {name: np.empty(self.capacity, dtype=np.float64) for name in SCRATCH_COLUMNS}
+        self._mask = np.empty(self.capacity, dtype=bool)
+
+    def compute(self, df):
+        """Same rows and columns as DataIngestion.__engineer_features__(df) for a single-symbol frame."""
+        n = len(df)
+        self._reserve(n)
+        open_time = df['Open time'].to_numpy().astype('datetime64[ms]').view(np.int64)
+        high = df['High'].to_numpy(dtype=np.float64)
+        low = df['Low'].to_numpy(dtype=np.float64)
+        close = df['Close'].to_numpy(dtype=np.float64)
+        volume = df['Volume'].to_numpy(dtype=np.float64)
+
+        f = {name: self._features[i, :n] for i, name in enumerate(FEATURE_COLUMNS)}
+        s = {name: values[:n] for name, values in self._scratch.items()}
+        s['funding_rate'][:] = df['funding_rate'].to_numpy(dtype=np.float64)
+
+        # Funding
+        _rolling_mean(s['funding_rate'], 200, f['funding_z'])
+        _rolling_std(s['funding_rate'], 200, s['shifted'])
+        np.subtract(s['funding_rate'], f['funding_z'], out=f['funding_z'])
+        np.divide(f['funding_z'], s['shifted'], out=f['funding_z'])
+
+        # Returns and volatility
+        r = f['log_average']
+        _shift(close, 1, r)
+        np.divide(close, r, out=r)
+        np.log(r, out=r)
+        _rolling_std(r, 10, f['vol_10'])
+        _rolling_std(r, 20, f['vol_20'])
+        _rolling_std(r, 40, f['vol_40'])
+        np.divide(f['vol_10'], f['vol_40'], out=f['vol_ratio'])
+
+        # Range
+        np.subtract(high, low, out=f['true_range'])
+        np.divide(f['true_range'], close, out=f['norm_range'])
+        _rolling_mean(f['true_range'], 14, f['atr_14'])
+        _rolling_mean(f['true_range'], 20, s['true_range_mean_20'])
+        np.divide(f['true_range'], s['true_range_mean_20'], out=f['range_ratio'])
+
+        # Volume
+        _rolling_mean(volume, 20, s['vol_mean_20'])
+        _rolling_std(volume, 20, s['vol_std_20'])
+        np.divide(volume, s['vol_mean_20'], out=f['vol_rel'])
+        np.subtract(volume, s['vol_mean_20'], out=f['vol_z'])
+        np.divide(f['vol_z'], s['vol_std_20'], out=f['vol_z'])
+        np.abs(r, out=f['abs_r_x_vol'])
+        np.multiply(f['abs_r_x_vol'], f['vol_rel'], out=f['abs_r_x_vol'])
+
+        # Regimes, as codes
+        _rolling_sum(r, 6, f['sum_r_6'])
+        code = f['trend_regime_code']
+        code.fill(TREND_REGIME_CODES['range'])
+        code[np.abs(f['sum_r_6']) > 0.01] = TREND_REGIME_CODES['trend']
+        vol_20 = f['vol_20']
+        code = f['vol_regime_code']
+        code.fill(VOL_REGIME_CODES['medium'])
+        if not np.isnan(vol_20).all():
+            q33, q67 = np.nanquantile(vol_20, [0.33, 0.67])
+            code[vol_20 >= q67] = VOL_REGIME_CODES['high']
+            code[vol_20 <= q33] = VOL_REGIME_CODES['low']
+
+        np.multiply(f['funding_z'], r, out=f['funding_x_ret'])
+        _shift(f['funding_z'], 1, f['funding_delta'])
+        np.subtract(f['funding_z'], f['funding_delta'], out=f['funding_delta'])
+
+        _ema(close, 20, s['ema_20'])
+        _ema(close, 50, s['ema_50'])
+        np.subtract(s['ema_20'], s['ema_50'], out=f['ema_diff'])
+
+        # Calendar, on UTC open times (1970-01-01 was a Thursday, dayofweek 3)
+        np.floor_divide(open_time, _MS_PER_HOUR, out=s['hour'], casting='unsafe')
+        np.mod(s['hour'], 24, out=s['hour'])
+        np.floor_divide(open_time, _MS_PER_DAY, out=s['day_of_week'], casting='unsafe')
+        np.add(s['day_of_week'], 3, out=s['day_of_week'])
+        np.mod(s['day_of_week'], 7, out=s['day_of_week'])
+        for name, values, period, func in (('hour_sin', s['hour'], 24, np.sin), ('hour_cos', s['hour'], 24, np.cos),
+                                           ('day_sin', s['day_of_week'], 7, np.sin), ('day_cos', s['day_of_week'], 7, np.cos)):
+            np.multiply(values, 2 * np.pi / period, out=f[name])
+            func(f[name], out=f[name])
+
+        for lag in (1, 2, 3, 5):
+            _shift(r, lag, f[f'ret_lag_{lag}'])
+            _shift(f['vol_rel'], lag, f[f'vol_lag_{lag}'])
+
+        _rolling_moments(r, 20, f['ret_skew_20'], f['ret_kurt_20'])
+        _shift(r, 1, s['shifted'])
+        _rolling_corr(r, s['shifted'], 20, f['ret_autocorr_20'])
+
+        # dropna(): the engineered frame only keeps rows where every feature is defined
+        mask = self._mask[:n]
+        np.logical_not(np.isnan(self._features[:, :n]).any(axis=0), out=mask)
+        index = df.index[mask]
+        out = pd.DataFrame(self._features[:, :n][:, mask].T, columns=FEATURE_COLUMNS, index=index)
+        return out.astype({'trend_regime_code': np.int8, 'vol_regime_code': np.int8})
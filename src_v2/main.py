@@ -1,13 +1,23 @@
+import os
+import csv
 import time
 from datetime import datetime, timedelta
-import pandas as pd
 import numpy as np
 from trading_functions import TradingFunctions
-from data_ingestion import DataIngestion
 from model import Classifier
 from trading_utils import TradingPrice
-from binance.client import Client
-from env import demo_futures_api, demo_futures_secret, test_net
+from analytics import Analytics
+from scheduler import PrefetchScheduler
+from pipeline import analyze_symbol
+from sharding import ShardCoordinator
+from metrics import metrics
+from memory import record_memory, release_memory
+from snapshot import load_snapshot
+from env import metrics_port, metrics_jsonl_path
+from env import universe, shard_workers, strategy_interval
+from timeframes import Timeframe
+from portfolio import PortfolioAllocator, returns_covariance
+from env import allocation_method, max_weight, max_gross_exposure, min_notional, min_notional_mode
 
 # Configuration
 TOP_10_CRYPTOS = [
@@ -23,50 +33,38 @@ TOP_10_CRYPTOS = [
     "AVAXUSDT"  # Avalanche
 ]
 
+TIMEFRAME = Timeframe(strategy_interval)
+
+# Trades are only placed this many minutes after a close (capped at one bar)
+TRADING_WINDOW_MINUTES = 30
+
+UNIVERSE_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "coinmetrics_assets.csv")
+
+def load_universe(exchange_symbols, path=UNIVERSE_CSV):
+    """USDT perpetual symbols for every asset in coinmetrics_assets.csv that is listed on Binance futures."""
+    symbols = []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            symbol = f"{row['asset'].upper()}USDT"
+            if symbol in exchange_symbols and symbol not in symbols:
+                symbols.append(symbol)
+    return symbols
+
 def get_next_candle_time():
-    """Calculates the next 4H candle close time."""
-    now = datetime.utcnow()
+    """Calculates the next candle close time for the strategy timeframe (4H by default)."""
     # 4H candles close at 0, 4, 8, 12, 16, 20
-    # We want the *next* boundary. 
     # If now is 04:00:00 -> Next is 08:00
     # If now is 03:59:59 -> Next is 04:00
-    
-    next_hour = ((now.hour // 4) + 1) * 4
-    if next_hour >= 24:
-        target = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
-    else:
-        target = now.replace(hour=next_hour, minute=0, second=0, microsecond=0)
-    return target
-
-def wait_for_next_candle():
-    """Sleeps until the next 4H candle close (with buffer)."""
-    target = get_next_candle_time()
-    now = datetime.utcnow()
-    
-    sleep_seconds = (target - now).total_seconds()
-    
-    # Add buffer (e.g., 2 mins) to ensure Binance has finalized the candle
-    buffer_seconds = 120 
-    total_sleep = sleep_seconds + buffer_seconds
-    
-    if total_sleep < 0:
-        # Should rarely happen with the logic above, but safety first
-        total_sleep = 0
-        
-    print(f"Next 4H candle closes at {target} UTC. Sleeping for {total_sleep/60:.2f} minutes.")
-    time.sleep(total_sleep)
+    return TIMEFRAME.next_close()
 
 def is_within_trading_window(minutes_tolerance=15):
     """
-    Checks if the current time is within 'minutes_tolerance' AFTER a 4H candle close.
-    Example: If tolerance is 15, valid times are 00:00-00:15, 04:00-04:15, etc.
+    Checks if the current time is within 'minutes_tolerance' AFTER a candle close.
+    Example: If tolerance is 15 on 4H, valid times are 00:00-00:15, 04:00-04:15, etc.
+    The tolerance is capped at one bar for shorter timeframes.
     This prevents the bot from executing 'stale' trades if started in the middle of a session.
     """
-    now = datetime.utcnow()
-    # Check if we are in the first X minutes of a 4-hour block
-    if now.hour % 4 == 0 and now.minute < minutes_tolerance:
-        return True
-    return False
+    return TIMEFRAME.is_within_window(minutes_tolerance)
 
 def get_total_usdt_capital(trading):
     """Calculates total available USDT equity."""
@@ -83,113 +81,116 @@ def get_total_usdt_capital(trading):
 
 def main():
     print("Starting CryptoV2 Bot with Portfolio Trading...")
+    if metrics.enabled and metrics_port:
+        metrics.start_http_server(metrics_port)
     
     # Initialize components
-    client = Client(demo_futures_api, demo_futures_secret, testnet=test_net)
-    trading = TradingFunctions(client)
+    # Nothing here waits on the network or on sklearn: exchange clients are created on
+    # first use, the model unpickles in the background and the order sync runs in a thread.
+    trading = TradingFunctions(sync=False)
+    model = Classifier(background=True) if shard_workers == 0 else None
+    # pandas and dateutil (~300ms) load here, after the model started unpickling, not on `import main`
+    from data_ingestion import DataIngestion
     data_ingestion = DataIngestion()
-    model = Classifier()
     trading_price = TradingPrice()
+    analytics = Analytics(trading.db)
+    allocator = PortfolioAllocator(
+        method=allocation_method,
+        max_weight=max_weight,
+        max_gross=max_gross_exposure,
+        min_notional=min_notional,
+        min_notional_mode=min_notional_mode
+    )
+
+    # Restore the state captured at the last warm-up
+    snapshot = load_snapshot()
+    trading.symbol_info = {symbol: tuple(info) for symbol, info in snapshot.get('symbol_info', {}).items()}
+    trading.sync_state_async()
+
+    if universe == "coinmetrics":
+        symbols = load_universe(trading.symbol_info or trading.load_exchange_info())
+    else:
+        symbols = TOP_10_CRYPTOS
+    print(f"Trading universe: {len(symbols)} symbols")
+
+    coordinator = ShardCoordinator(symbols, shard_workers) if shard_workers > 0 else None
+    scheduler = PrefetchScheduler(
+        data_ingestion, trading, symbols,
+        next_close_fn=get_next_candle_time,
+        capital_fn=get_total_usdt_capital,
+        coordinator=coordinator
+    )
+    # Capital is only trusted from a snapshot taken within the last bar
+    if time.time() - snapshot.get('saved_at', 0) < TIMEFRAME.period.total_seconds():
+        scheduler.capital = snapshot.get('capital')
 
     while True:
         try:
             print(f"\n--- Analysis cycle check at {datetime.utcnow()} ---")
             
             # Check if we are inside the valid execution window
-            if not is_within_trading_window(minutes_tolerance=30):
-                print("Outside of 30-minute post-close trading window. Skipping trade execution to prevent stale signals.")
-                wait_for_next_candle()
+            if not is_within_trading_window(minutes_tolerance=TRADING_WINDOW_MINUTES):
+                print(f"Outside of {TRADING_WINDOW_MINUTES}-minute post-close trading window. Skipping trade execution to prevent stale signals.")
+                scheduler.wait_and_warm_up()
                 continue # Restart loop, which triggers valid timestamps check
             
             # Phase 1: Data Gathering & Prediction
             analysis_results = {}
-            total_inverse_volilaty = 0
             
             print("Analyzing portfolio...")
+            cycle_start = time.perf_counter()
             # Double check time again to ensure 'is_within' didn't pass us at minute 29 and we take 5 mins to run
             # but that's fine, as long as we STARTED freshness check.
             
-            current_capital = get_total_usdt_capital(trading)
+            current_capital = scheduler.pop_capital()
             print(f"Total USDT Capital: {current_capital}")
 
             # Safe usage fraction (e.g. use 90% of capital across all trades to leave buffer)
             deployable_capital = current_capital * 0.90 
 
-            for symbol in TOP_10_CRYPTOS:
-                try:
-                    # 1. Get Data
-                    df = data_ingestion.get_data(symbol)
-                    if df.empty: 
-                        print(f"Skipping {symbol}: No data found")
-                        continue
-
-                    # 2. Engineer Features
-                    df_features = data_ingestion.__engineer_features__(df)
-                    
-                    if df_features.empty:
-                        print(f"Skipping {symbol}: Feature engineering returned empty")
-                        continue
+            # 1. Get Data (only the final candle when the history was prefetched) and analyze
+            candle_open = get_next_candle_time() - TIMEFRAME.period
+            if coordinator is not None:
+                # Shards get the trading window minus a reserve for execution, never longer
+                window = timedelta(minutes=min(TRADING_WINDOW_MINUTES, TIMEFRAME.minutes))
+                reserve = min(window / 3, timedelta(minutes=5))
+                timeout = max(0.0, (candle_open + window - reserve - datetime.utcnow()).total_seconds())
+                with metrics.timer('stage_seconds', stage='shard_analysis'):
+                    analysis_results = coordinator.analyze(candle_open, timeout=timeout)
+            else:
+                with metrics.timer('stage_seconds', stage='fetch_latest'):
+                    latest_data = scheduler.fetch_latest(candle_open)
 
-                    # 3. Predict
-                    probs = model.predict(df_features)
-                    
-                    # 4. Edge & Decision
-                    edge = trading_price.calculate_edge(probs)
-                    side, leverage, desc = trading_price.get_trade_decision(edge)
-
-                    # 5. Volatility for Weighting
-                    # Use the last calculated volatility. 
-                    # If df_features has 'vol_20', we use that.
-                    # It matches the prediction row.
-                    volatility = df_features.iloc[-1]['vol_20']
-                    
-                    # Capture ATR for strategic orders
-                    atr = df_features.iloc[-1]['atr_14']
-                    
-                    # Store results
-                    analysis_results[symbol] = {
-                        'side': side,
-                        'leverage': leverage,
-                        'desc': desc,
-                        'volatility': volatility,
-                        'edge': edge,
-                        'atr': atr
-                    }
-                    
-                    # Accumulate inverse volatility (Handle 0 vol case)
-                    if volatility > 0:
-                        total_inverse_volilaty += (1.0 / volatility)
-                    
-                    print(f"{symbol}: {side} ({desc}) | Edge: {edge:.4f} | Vol: {volatility:.4f}")
+                for symbol in symbols:
+                    result = analyze_symbol(symbol, latest_data.get(symbol), data_ingestion, model, trading_price)
+                    if result is not None:
+                        analysis_results[symbol] = result
 
-                except Exception as e:
-                    print(f"Error analyzing {symbol}: {e}")
-                    continue
-            
             # Phase 2: Weighting & Execution
-            if total_inverse_volilaty == 0:
-                print("Total inverse volatility is 0, falling back to Equal Weighting")
-                # Avoid division by zero
-                total_inverse_volilaty = 1 # Dummy value, logic handled in loop
+            symbols_analyzed = list(analysis_results)
+            weights, notionals = [], []
+            if symbols_analyzed:
+                signals = [analysis_results[symbol] for symbol in symbols_analyzed]
+                covariance = None
+                if allocator.method != 'inverse_vol':
+                    covariance = returns_covariance([signal['returns'] for signal in signals])
+                with metrics.timer('stage_seconds', stage='allocation'):
+                    weights, notionals = allocator.allocate(
+                        edges=np.array([signal['edge'] for signal in signals]),
+                        volatilities=np.array([signal['volatility'] for signal in signals]),
+                        capital=deployable_capital,
+                        covariance=covariance,
+                        # NEUTRAL signals only close positions, they get no capital
+                        active=np.array([signal['side'] != 'NEUTRAL' for signal in signals])
+                    )
             
             print("\nExecuting Trades...")
-            for symbol, result in analysis_results.items():
+            for symbol, weight, position_size_usdt in zip(symbols_analyzed, weights, notionals):
+                result = analysis_results[symbol]
+                exec_start = time.perf_counter()
                 try:
                     side = result['side']
                     leverage = result['leverage']
-                    volatility = result['volatility']
-
-                    # Weighting Algorithm: Inverse Volatility
-                    if total_inverse_volilaty > 1 and volatility > 0:
-                        weight = (1.0 / volatility) / total_inverse_volilaty
-                    else:
-                        weight = 1.0 / len(analysis_results) # Fallback Equal Weight
-
-                    position_size_usdt = deployable_capital * weight
-                    
-                    # Min trade size check (Binance min is usually 5-10 USDT)
-                    if position_size_usdt < 6: 
-                        position_size_usdt = 6
 
                     print(f"--> {symbol}: Weight {weight:.2%} -> Size ${position_size_usdt:.2f}")
 
@@ -225,11 +226,29 @@ def main():
                             atr=atr
                         )
 
+                    metrics.observe('stage_seconds', time.perf_counter() - exec_start, stage='execution', symbol=symbol)
                 except Exception as e:
                     print(f"Error executing trade for {symbol}: {e}")
+                    metrics.inc('symbol_errors_total', stage='execution', symbol=symbol)
+
+            # Fold this cycle's orders and balances into the rollup tables, once their fills are priced
+            trading.sync_orders()
+            analytics.refresh()
+            analytics.compact(retain_days=90)
+
+            # Bounded mode hands this cycle's garbage back to the OS so RSS stays flat over weeks
+            if data_ingestion.memory_mode == 'bounded':
+                release_memory()
+            memory = record_memory(data_ingestion.memory_nbytes())
+            print(f"Memory: RSS {memory['rss_bytes'] / 2**20:.1f} MB (peak {memory['peak_rss_bytes'] / 2**20:.1f} MB)")
+
+            metrics.observe('cycle_seconds', time.perf_counter() - cycle_start)
+            metrics.inc('cycles_total')
+            if metrics_jsonl_path:
+                metrics.dump_jsonl(metrics_jsonl_path)
 
             print("Cycle complete.")
-            wait_for_next_candle()
+            scheduler.wait_and_warm_up()
             
         except Exception as e:
             print(f"CRITICAL ERROR in main loop: {e}")
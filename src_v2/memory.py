@@ -0,0 +1,58 @@
+import gc
+import os
+import sys
+import resource
+import tracemalloc
+from metrics import metrics
+
+_libc = None
+
+
+def rss_bytes():
+    """Current resident set size, from /proc on Linux; the peak RSS elsewhere."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def release_memory():
+    """
+    Collects garbage and asks glibc to hand freed heap pages back to the OS. Without the
+    trim, fragmented arenas keep RSS at its high-water mark even when Python has freed the memory.
+    """
+    global _libc
+    gc.collect()
+    if not sys.platform.startswith('linux'):
+        return
+    try:
+        if _libc is None:
+            import ctypes
+            _libc = ctypes.CDLL('libc.so.6')
+        _libc.malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def record_memory(buffer_bytes=None):
+    """Exports this cycle's memory usage as gauges and returns it."""
+    stats = {
+        'rss_bytes': rss_bytes(),
+        'peak_rss_bytes': peak_rss_bytes(),
+        'gc_objects': len(gc.get_objects()),
+    }
+    if buffer_bytes is not None:
+        stats['history_buffer_bytes'] = buffer_bytes
+    # Only when started with PYTHONTRACEMALLOC=1 or tracemalloc.start(); tracing slows everything down
+    if tracemalloc.is_tracing():
+        stats['traced_bytes'], stats['traced_peak_bytes'] = tracemalloc.get_traced_memory()
+    for name, value in stats.items():
+        metrics.set_gauge(f"memory_{name}", value)
+    return stats
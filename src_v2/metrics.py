@@ -0,0 +1,246 @@
+import json
+import time
+import bisect
+import threading
+from urllib.parse import urlparse
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from env import metrics_enabled
+
+# Latency histogram buckets in seconds (upper bounds, Prometheus style)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _NullTimer:
+    """Shared no-op context manager handed out when metrics are disabled."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'labels', 'start')
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        if exc_type is not None:
+            self.metrics.inc(f"{self.name}_errors_total", **self.labels)
+        return False
+
+
+class Metrics:
+    """
+    In-process counters, gauges and latency histograms keyed by name + labels.
+    When disabled every call returns immediately, so instrumentation can stay in the hot path.
+    """
+    def __init__(self, enabled=False, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}  # key -> [bucket_counts, sum, count]
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+    def timer(self, name, **labels):
+        """Context manager recording the duration of the block into the `name` histogram."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def timed(self, name, **labels):
+        """Decorator version of timer()."""
+        def decorator(func):
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return func(*args, **kwargs)
+            wrapper.__name__ = func.__name__
+            wrapper.__doc__ = func.__doc__
+            return wrapper
+        return decorator
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._histograms[key] = hist
+            hist[0][index] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def record_used_weight(self, headers, endpoint=None, api=None, url=None):
+        """
+        Tracks Binance request weight from the X-MBX-USED-WEIGHT-1M response header.
+        Spot, futures, testnet and production each have their own budget, so the gauge
+        is labelled by API and host.
+        """
+        if not self.enabled or headers is None:
+            return
+        used = headers.get('X-MBX-USED-WEIGHT-1M') or headers.get('x-mbx-used-weight-1m')
+        if used is not None:
+            host = urlparse(url).netloc if url else None
+            self.set_gauge('binance_used_weight_1m', float(used), api=api, host=host)
+        self.inc('binance_requests_total', endpoint=endpoint)
+
+    # --- Exporters ---
+
+    def snapshot(self):
+        """Returns a JSON-serializable copy of every metric."""
+        def labels(key):
+            return dict(key[1])
+
+        with self._lock:
+            return {
+                'timestamp': time.time(),
+                'counters': [{'name': k[0], 'labels': labels(k), 'value': v} for k, v in self._counters.items()],
+                'gauges': [{'name': k[0], 'labels': labels(k), 'value': v} for k, v in self._gauges.items()],
+                'histograms': [
+                    {
+                        'name': k[0], 'labels': labels(k),
+                        'buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'], h[0])),
+                        'sum': h[1], 'count': h[2]
+                    }
+                    for k, h in self._histograms.items()
+                ]
+            }
+
+    def dump_jsonl(self, path):
+        """Appends one snapshot line to a JSON-lines file."""
+        if not self.enabled:
+            return
+        try:
+            with open(path, 'a') as f:
+                f.write(json.dumps(self.snapshot()) + '\n')
+        except Exception as e:
+            print(f"Metrics Error writing {path}: {e}")
+
+    def render_prometheus(self):
+        """Renders all metrics in the Prometheus text exposition format."""
+        def escape(value):
+            return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+        def fmt(labels, extra=()):
+            items = list(labels) + list(extra)
+            if not items:
+                return ''
+            return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in items) + '}'
+
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            # One TYPE line per metric family, ahead of its first sample
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                declare(name, 'counter')
+                lines.append(f"{name}{fmt(labels)} {value}")
+            for (name, labels), value in sorted(self._gauges.items()):
+                declare(name, 'gauge')
+                lines.append(f"{name}{fmt(labels)} {value}")
+            for (name, labels), (counts, total, count) in sorted(self._histograms.items()):
+                declare(name, 'histogram')
+                cumulative = 0
+                for bound, bucket_count in zip(list(self.buckets) + ['+Inf'], counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{fmt(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_sum{fmt(labels)} {total}")
+                lines.append(f"{name}_count{fmt(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+    def start_http_server(self, port, host='0.0.0.0'):
+        """Serves render_prometheus() on http://host:port/metrics from a daemon thread."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = HTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"Metrics available at http://{host}:{port}/metrics")
+        return server
+
+
+class InstrumentedClient:
+    """
+    Wraps a python-binance Client so every REST method is timed and counted, tagged by
+    endpoint and symbol, and the used request weight is read from the last response.
+    """
+    def __init__(self, client, registry):
+        self._client = client
+        self._registry = registry
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr) or name.startswith('_'):
+            return attr
+        registry = self._registry
+        client = self._client
+
+        def call(*args, **kwargs):
+            with registry.timer('exchange_request_seconds', endpoint=name, symbol=kwargs.get('symbol')):
+                result = attr(*args, **kwargs)
+            response = getattr(client, 'response', None)
+            registry.record_used_weight(
+                getattr(response, 'headers', None), endpoint=name,
+                api='futures' if name.startswith('futures_') else 'spot', url=getattr(response, 'url', None)
+            )
+            return result
+        return call
+
+
+def instrument_client(client):
+    """Returns the client wrapped for metrics, or unchanged when metrics are disabled."""
+    if not metrics.enabled:
+        return client
+    return InstrumentedClient(client, metrics)
+
+
+# Process-wide registry
+metrics = Metrics(enabled=metrics_enabled)
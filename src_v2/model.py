@@ -1,18 +1,45 @@
-import pickle as pkl 
-from sklearn.ensemble import RandomForestClassifier
-import pandas as pd
-from data_ingestion import DataIngestion
+from __future__ import annotations
+import pickle as pkl
+import threading
+from typing import TYPE_CHECKING
+from env import model_path
+if TYPE_CHECKING:
+    import pandas as pd
 class Classifier:
-    def __init__(self) :
-        with open('CryptoV2/src/best_random_forest_model.pkl' , 'rb') as file :
-            self.model = pkl.load(file=file)
+    def __init__(self , path=None , background=False) :
+        self.path = path or model_path
+        self.model = None
+        self._loaded = threading.Event()
+        # Unpickling imports sklearn and takes seconds, so it can run off the startup path
+        if background:
+            threading.Thread(target=self._load, args=(True,), name="model-loader", daemon=True).start()
+        else:
+            self._load(background=False)
+    def _load(self, background):
+        try:
+            with open(self.path , 'rb') as file :
+                self.model = pkl.load(file=file)
+        except Exception as e:
+            print(f"Error loading model from {self.path}: {e}")
+            # In the background predict() reports it; a synchronous load fails the constructor
+            if not background:
+                raise
+        finally:
+            self._loaded.set()
+    def wait_until_loaded(self):
+        self._loaded.wait()
+        if self.model is None:
+            raise RuntimeError(f"Model could not be loaded from {self.path}")
     def predict(self , df : pd.DataFrame):
+        if self.model is None:
+            self.wait_until_loaded()
         x = df.iloc[[-2]]
         probs = self.model.predict_proba(x)
-        return probs 
+        return probs
 
 
 if __name__ == '__main__' :
+    from data_ingestion import DataIngestion
     model = Classifier()
     data_p = DataIngestion()
     data = data_p.get_data('BTCUSDT')
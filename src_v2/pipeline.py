@@ -0,0 +1,100 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from metrics import metrics
+
+# Bars of log returns kept per signal for the allocator's covariance estimate
+RETURNS_WINDOW = 120
+# How long after the close to keep polling for a symbol's new candle; illiquid symbols can lag
+CANDLE_WAIT_SECONDS = 90
+
+
+def fetch_latest(data_ingestion, symbols, candle_open, max_workers=8, max_wait=CANDLE_WAIT_SECONDS, retry_delay=2.0):
+    """
+    Fetches the final candle for every symbol in parallel. `candle_open` is the open time of
+    the candle that started at the close; its presence proves the previous candle is final.
+    Returns {symbol: DataFrame}; symbols whose candle is still missing after retrying for
+    `max_wait` seconds are left out rather than analyzed on a stale frame.
+    """
+    deadline = time.monotonic() + max_wait
+
+    def fetch(symbol):
+        attempts = 0
+        while True:
+            attempts += 1
+            with metrics.timer('stage_seconds', stage='get_data', symbol=symbol):
+                df = data_ingestion.get_latest(symbol)
+            if df.empty or df['Open time'].iloc[-1] >= candle_open:
+                return df
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(retry_delay, remaining))
+        print(f"Skipping {symbol}: candle {candle_open} still missing after {attempts} attempts over {max_wait:.0f}s")
+        metrics.inc('stale_candles_total', symbol=symbol)
+        return None
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {symbol: pool.submit(fetch, symbol) for symbol in symbols}
+        for symbol, future in futures.items():
+            try:
+                df = future.result()
+            except Exception as e:
+                print(f"Error fetching latest data for {symbol}: {e}")
+                continue
+            if df is not None:
+                results[symbol] = df
+    return results
+
+
+def analyze_symbol(symbol, df, data_ingestion, model, trading_price):
+    """Features -> prediction -> edge/decision for one symbol. Returns the signal dict, or None to skip."""
+    try:
+        if df is None or df.empty:
+            print(f"Skipping {symbol}: No data found")
+            return None
+
+        # 2. Engineer Features
+        with metrics.timer('stage_seconds', stage='engineer_features', symbol=symbol):
+            df_features = data_ingestion.__engineer_features__(df)
+
+        if df_features.empty:
+            print(f"Skipping {symbol}: Feature engineering returned empty")
+            return None
+
+        # 3. Predict
+        with metrics.timer('stage_seconds', stage='predict', symbol=symbol):
+            probs = model.predict(df_features)
+
+        # 4. Edge & Decision
+        with metrics.timer('stage_seconds', stage='decision', symbol=symbol):
+            edge = trading_price.calculate_edge(probs)
+            side, leverage, desc = trading_price.get_trade_decision(edge)
+
+        # 5. Volatility for Weighting
+        # Use the last calculated volatility.
+        # If df_features has 'vol_20', we use that.
+        # It matches the prediction row.
+        volatility = df_features.iloc[-1]['vol_20']
+
+        # Capture ATR for strategic orders
+        atr = df_features.iloc[-1]['atr_14']
+
+        # Up to the prediction row (the last row is the candle that just opened)
+        returns = df_features['log_average'].to_numpy()[-(RETURNS_WINDOW + 1):-1]
+
+        print(f"{symbol}: {side} ({desc}) | Edge: {edge:.4f} | Vol: {volatility:.4f}")
+        return {
+            'side': side,
+            'leverage': leverage,
+            'desc': desc,
+            'volatility': float(volatility),
+            'edge': float(edge),
+            'atr': float(atr),
+            'returns': returns
+        }
+
+    except Exception as e:
+        print(f"Error analyzing {symbol}: {e}")
+        metrics.inc('symbol_errors_total', stage='analysis', symbol=symbol)
+        return None
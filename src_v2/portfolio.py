@@ -0,0 +1,179 @@
+import numpy as np
+
+METHODS = ('inverse_vol', 'erc', 'edge_scaled')
+
+
+def inverse_volatility_weights(volatilities, active=None):
+    """w_i ∝ 1/σ_i over active assets with a positive, finite volatility; equal weights if there are none."""
+    vols = np.asarray(volatilities, dtype=np.float64)
+    mask = np.isfinite(vols) & (vols > 0)
+    if active is not None:
+        mask &= active
+    weights = np.zeros_like(vols)
+    if mask.any():
+        weights[mask] = 1.0 / vols[mask]
+        return weights / weights.sum()
+    # Nothing usable to weight by: fall back to equal weights, explicitly
+    eligible = np.ones(len(vols), dtype=bool) if active is None else np.asarray(active, dtype=bool)
+    if eligible.any():
+        weights[eligible] = 1.0 / eligible.sum()
+    return weights
+
+
+def equal_risk_contribution_weights(covariance, active=None, max_iter=1000, tol=1e-10):
+    """
+    Long-only weights where every active asset contributes the same share of
+    portfolio variance, w_i (Σw)_i = σ_p² / n. Solved with the multiplicative
+    fixed-point update w <- w * sqrt(mean(rc) / rc), all vectorized.
+    """
+    cov = np.asarray(covariance, dtype=np.float64)
+    n = cov.shape[0]
+    mask = np.ones(n, dtype=bool) if active is None else np.asarray(active, dtype=bool).copy()
+    mask &= np.isfinite(np.diag(cov)) & (np.diag(cov) > 0)
+    weights = np.zeros(n)
+    if not mask.any():
+        return weights
+
+    sub = cov[np.ix_(mask, mask)]
+    # Inverse-vol is the exact answer for uncorrelated assets and a good starting point otherwise
+    w = 1.0 / np.sqrt(np.diag(sub))
+    w /= w.sum()
+    for _ in range(max_iter):
+        rc = w * (sub @ w)
+        if np.any(rc <= 0):
+            break
+        target = rc.mean()
+        if np.max(np.abs(rc - target)) <= tol * target:
+            break
+        w *= np.sqrt(target / rc)
+        w /= w.sum()
+    weights[mask] = w
+    return weights
+
+
+def apply_caps(weights, max_weight=1.0, max_gross=1.0):
+    """
+    Scales the weights to sum to max_gross, then caps each at max_weight (a fraction
+    of deployable capital), handing the excess to the uncapped assets pro rata
+    (water-filling). If the cap binds everywhere the leftover stays undeployed.
+    """
+    w = np.asarray(weights, dtype=np.float64).copy()
+    total = w.sum()
+    if total <= 0:
+        return w
+    w *= max_gross / total
+    capped = np.zeros(len(w), dtype=bool)
+    for _ in range(len(w)):
+        over = (w > max_weight) & ~capped
+        if not over.any():
+            break
+        excess = (w[over] - max_weight).sum()
+        w[over] = max_weight
+        capped |= over
+        free = ~capped & (w > 0)
+        if not free.any():
+            break
+        w[free] += excess * w[free] / w[free].sum()
+    return w
+
+
+def returns_covariance(returns, min_periods=20):
+    """
+    Sample covariance of per-asset return histories, aligned on their most recent
+    common tail. Returns None when the overlap is shorter than min_periods.
+    """
+    if not returns:
+        return None
+    length = min(len(r) for r in returns)
+    if length < min_periods:
+        return None
+    matrix = np.vstack([np.asarray(r[-length:], dtype=np.float64) for r in returns])
+    matrix = np.nan_to_num(matrix)
+    return np.atleast_2d(np.cov(matrix))
+
+
+class PortfolioAllocator:
+    """
+    Turns per-asset signals (edge, volatility, return covariance) into target
+    weights and notionals for the whole universe at once.
+
+    method: 'inverse_vol', 'erc' (equal risk contribution, needs a covariance),
+    or 'edge_scaled' (inverse-vol or ERC base weights tilted by |edge|).
+    """
+    def __init__(self, method='inverse_vol', max_weight=1.0, max_gross=1.0,
+                 min_notional=6.0, min_notional_mode='raise'):
+        if method not in METHODS:
+            raise ValueError(f"Unknown allocation method: {method}")
+        if min_notional_mode not in ('raise', 'drop'):
+            raise ValueError(f"Unknown min_notional_mode: {min_notional_mode}")
+        self.method = method
+        self.max_weight = max_weight
+        self.max_gross = max_gross
+        self.min_notional = min_notional
+        # 'raise' lifts small positions to the exchange minimum, 'drop' removes them and re-spreads
+        self.min_notional_mode = min_notional_mode
+
+    def target_weights(self, edges, volatilities, covariance=None, active=None):
+        """Capped weights (fractions of deployable capital) for every asset."""
+        vols = np.asarray(volatilities, dtype=np.float64)
+        active = None if active is None else np.asarray(active, dtype=bool)
+
+        if self.method in ('erc', 'edge_scaled') and covariance is not None:
+            base = equal_risk_contribution_weights(covariance, active)
+        else:
+            base = inverse_volatility_weights(vols, active)
+
+        if self.method == 'edge_scaled':
+            tilted = base * np.abs(np.nan_to_num(np.asarray(edges, dtype=np.float64)))
+            base = tilted if tilted.sum() > 0 else base
+
+        return apply_caps(base, self.max_weight, self.max_gross)
+
+    def allocate(self, edges, volatilities, capital, covariance=None, active=None):
+        """Returns (weights, notionals) arrays aligned with the inputs."""
+        weights = self.target_weights(edges, volatilities, covariance, active)
+        notionals = weights * capital
+
+        if self.min_notional <= 0:
+            # No exchange minimum to honour
+            return weights, notionals
+        if self.min_notional_mode == 'raise':
+            weights, notionals = self._raise_to_min_notional(weights, capital)
+        else:
+            # Dropping an asset frees capital for the rest, which can push others over the minimum
+            for _ in range(len(weights)):
+                small = (weights > 0) & (notionals < self.min_notional)
+                if not small.any():
+                    break
+                weights[small] = 0.0
+                weights = apply_caps(weights, self.max_weight, self.max_gross) if weights.any() else weights
+                notionals = weights * capital
+        return weights, notionals
+
+    def _raise_to_min_notional(self, weights, capital):
+        """
+        Lifts small positions to min_notional without breaking the gross cap: the raise is
+        taken back out of the positions above the minimum, and when even one minimum-size
+        position per asset does not fit, the smallest weights are dropped first.
+        Returns (weights, notionals) with weights == notionals / capital.
+        """
+        budget = self.max_gross * capital
+        held = weights > 0
+        if budget <= 0 or not held.any():
+            return np.zeros_like(weights), np.zeros_like(weights)
+
+        fits = int(budget / self.min_notional + 1e-9)
+        if held.sum() > fits:
+            keep = np.argsort(-weights, kind='stable')[:fits]
+            kept = np.zeros_like(weights)
+            kept[keep] = weights[keep]
+            weights = apply_caps(kept, self.max_weight, self.max_gross) if kept.any() else kept
+            held = weights > 0
+
+        notionals = np.where(held, np.maximum(weights * capital, self.min_notional), 0.0)
+        excess = notionals.sum() - budget
+        room = np.where(held, notionals - self.min_notional, 0.0)
+        if excess > 0 and room.sum() > 0:
+            # Every held asset fits at the minimum, so the room above it covers the excess
+            notionals -= room * min(1.0, excess / room.sum())
+        return notionals / capital, notionals
@@ -0,0 +1,286 @@
+import time
+import threading
+from urllib.parse import urlparse
+from metrics import metrics
+
+# Largest page the kline endpoints return
+KLINES_PAGE_LIMIT = 1000
+
+# Priorities, lower is served first: orders never queue behind bulk data fetches
+ORDER, ACCOUNT, MARKET_DATA = 0, 1, 2
+
+# Binance per-IP limits: (capacity, window seconds). Spot and futures are budgeted separately.
+DEFAULT_LIMITS = {
+    'spot_weight': (6000, 60),
+    'futures_weight': (2400, 60),
+    'futures_orders': (300, 10),
+}
+SAFETY_FRACTION = 0.8
+
+# Request weight per python-binance method (unlisted methods count as 1)
+ENDPOINT_WEIGHTS = {
+    'get_klines': 2,
+    'futures_klines': 5,
+    'futures_account_balance': 5,
+    'futures_position_information': 5,
+    'futures_account': 5,
+    'futures_exchange_info': 1,
+}
+ORDER_METHODS = {
+    'futures_create_order',
+    'futures_cancel_order',
+    'futures_cancel_all_open_orders',
+    'futures_change_leverage',
+    'futures_change_margin_type',
+}
+ACCOUNT_METHODS = {
+    'futures_account',
+    'futures_account_balance',
+    'futures_position_information',
+    'futures_get_order',
+    'futures_get_open_orders',
+}
+
+
+class RateLimitError(Exception):
+    """Raised for 429/418 responses from calls made outside python-binance."""
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"HTTP {status_code} from Binance")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, limit, window_seconds, safety=SAFETY_FRACTION):
+        self.limit = limit
+        self.capacity = limit * safety
+        self.rate = self.capacity / window_seconds
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def seconds_until(self, amount):
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+
+def classify(method_name):
+    """Returns (api, weight, priority, orders) for a python-binance method name."""
+    api = 'futures' if method_name.startswith('futures_') else 'spot'
+    weight = ENDPOINT_WEIGHTS.get(method_name, 1)
+    if method_name in ORDER_METHODS:
+        return api, weight, ORDER, 1 if method_name == 'futures_create_order' else 0
+    if method_name in ACCOUNT_METHODS:
+        return api, weight, ACCOUNT, 0
+    return api, weight, MARKET_DATA, 0
+
+
+def _status_code(error):
+    return getattr(error, 'status_code', None)
+
+
+def _retry_after(error):
+    retry_after = getattr(error, 'retry_after', None)
+    if retry_after is None:
+        response = getattr(error, 'response', None)
+        retry_after = getattr(response, 'headers', {}).get('Retry-After') if response is not None else None
+    try:
+        return float(retry_after) if retry_after is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestScheduler:
+    """
+    Process-wide gate for every exchange call. Keeps a token bucket per limit and
+    host (testnet and production count separately), re-syncs it from the
+    X-MBX-USED-WEIGHT-1M / X-MBX-ORDER-COUNT-10S headers, serves callers waiting on
+    the same budget strictly by priority, and pauses the whole API on that host after a 429
+    (rate limited) or 418 (IP banned) for as long as Binance asks.
+    """
+    def __init__(self, limits=DEFAULT_LIMITS, safety=SAFETY_FRACTION, max_retries=3):
+        self._cond = threading.Condition()
+        self._limits = dict(limits)
+        self._safety = safety
+        # (host, limit name) -> TokenBucket, created on the first call to each host
+        self._buckets = {}
+        # (api, host) -> callers waiting per priority; callers only yield to others on the same budget
+        self._waiting = {}
+        self._blocked_until = {}
+        self._backoff_count = {}
+        self.max_retries = max_retries
+
+    def _bucket(self, host, name):
+        bucket = self._buckets.get((host, name))
+        if bucket is None and name in self._limits:
+            limit, window = self._limits[name]
+            bucket = self._buckets[(host, name)] = TokenBucket(limit, window, self._safety)
+        return bucket
+
+    def _needs(self, api, host, weight, orders):
+        needs = [(self._bucket(host, f"{api}_weight"), weight)]
+        if orders and f"{api}_orders" in self._limits:
+            needs.append((self._bucket(host, f"{api}_orders"), orders))
+        return [(bucket, min(amount, bucket.capacity)) for bucket, amount in needs]
+
+    def acquire(self, api, weight=1, priority=MARKET_DATA, orders=0, host=None):
+        """Blocks until the call fits in the budget and no higher-priority call is waiting."""
+        start = time.monotonic()
+        with self._cond:
+            needs = self._needs(api, host, weight, orders)
+            waiting = self._waiting.setdefault((api, host), [0, 0, 0])
+            waiting[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._blocked_until.get((api, host), 0) - now
+                    if wait <= 0:
+                        if any(waiting[p] for p in range(priority)):
+                            wait = 0.05
+                        else:
+                            for bucket, _ in needs:
+                                bucket.refill(now)
+                            wait = max(bucket.seconds_until(amount) for bucket, amount in needs)
+                            if wait <= 0:
+                                for bucket, amount in needs:
+                                    bucket.tokens -= amount
+                                break
+                    self._cond.wait(timeout=max(wait, 0.001))
+            finally:
+                waiting[priority] -= 1
+                self._cond.notify_all()
+        waited = time.monotonic() - start
+        if waited > 0.001:
+            metrics.observe('rate_limit_wait_seconds', waited, api=api, host=host, priority=priority)
+
+    def update_from_headers(self, api, headers, host=None):
+        """Aligns the host's buckets with what Binance reports as already used in the current window."""
+        if not headers:
+            return
+        with self._cond:
+            now = time.monotonic()
+            for header, bucket_name in (('X-MBX-USED-WEIGHT-1M', f"{api}_weight"),
+                                        ('X-MBX-ORDER-COUNT-10S', f"{api}_orders")):
+                used = headers.get(header)
+                if used is None:
+                    continue
+                bucket = self._bucket(host, bucket_name)
+                if bucket is None:
+                    continue
+                bucket.refill(now)
+                # Budget left under our safety cap; may go negative, which makes callers wait
+                bucket.tokens = min(bucket.tokens, bucket.capacity - float(used))
+
+    def backoff(self, api, status_code, retry_after=None, host=None):
+        """Pauses every call to `api` on `host` after a 429/418."""
+        key = (api, host)
+        with self._cond:
+            count = self._backoff_count.get(key, 0) + 1
+            self._backoff_count[key] = count
+            if retry_after is None:
+                # 418 means the IP is already banned; back off much harder
+                retry_after = (120 if status_code == 418 else 1) * 2 ** (count - 1)
+            self._blocked_until[key] = max(self._blocked_until.get(key, 0), time.monotonic() + retry_after)
+            self._cond.notify_all()
+        print(f"Rate limited by Binance ({status_code}) on {api} API ({host}), pausing for {retry_after:.0f}s")
+        metrics.inc('rate_limited_total', api=api, host=host, status=status_code)
+
+    def execute(self, func, api, weight=1, priority=MARKET_DATA, orders=0, response_headers=None, host=None):
+        """Runs func() inside the host's budget, retrying after 429/418 backoffs."""
+        for attempt in range(self.max_retries + 1):
+            self.acquire(api, weight, priority, orders, host)
+            try:
+                result = func()
+            except Exception as e:
+                status = _status_code(e)
+                if status in (429, 418) and attempt < self.max_retries:
+                    self.backoff(api, status, _retry_after(e), host)
+                    continue
+                raise
+            finally:
+                if response_headers is not None:
+                    self.update_from_headers(api, response_headers(), host)
+            self._backoff_count[(api, host)] = 0
+            return result
+
+
+def host_of(url):
+    return urlparse(url).netloc if url else None
+
+
+def client_host(client, api):
+    """Host python-binance sends `api` calls to, following its testnet/demo switches."""
+    prefix = 'FUTURES' if api == 'futures' else 'API'
+    if getattr(client, 'testnet', False):
+        url = getattr(client, f"{prefix}_TESTNET_URL", None)
+    elif getattr(client, 'demo', False):
+        url = getattr(client, f"{prefix}_DEMO_URL", None)
+    else:
+        url = getattr(client, f"{prefix}_URL", None)
+    return host_of(url)
+
+
+def _to_milliseconds(value):
+    if value is None or not isinstance(value, str):
+        return None if value is None else int(value)
+    from binance.helpers import date_to_milliseconds
+    return date_to_milliseconds(value)
+
+
+class ScheduledClient:
+    """
+    Routes every python-binance REST method through the RequestScheduler.
+    Historical klines are paged here rather than inside python-binance, so every
+    page is its own scheduled request.
+    """
+    def __init__(self, client, scheduler):
+        self._client = client
+        self._scheduler = scheduler
+
+    def get_historical_klines(self, symbol, interval, start_str=None, end_str=None, limit=KLINES_PAGE_LIMIT):
+        return self._paged_klines(self.get_klines, symbol, interval, start_str, end_str, limit)
+
+    def futures_historical_klines(self, symbol, interval, start_str=None, end_str=None, limit=KLINES_PAGE_LIMIT):
+        return self._paged_klines(self.futures_klines, symbol, interval, start_str, end_str, limit)
+
+    @staticmethod
+    def _paged_klines(fetch, symbol, interval, start_str, end_str, limit):
+        """Klines from start_str (date string or ms) to end_str/now, one scheduled call per page."""
+        start_ms = _to_milliseconds(start_str)
+        end_ms = _to_milliseconds(end_str)
+        klines = []
+        while True:
+            params = {'symbol': symbol, 'interval': interval, 'limit': limit}
+            if start_ms is not None:
+                params['startTime'] = start_ms
+            if end_ms is not None:
+                params['endTime'] = end_ms
+            page = fetch(**params)
+            klines.extend(page)
+            if len(page) < limit:
+                return klines
+            start_ms = page[-1][0] + 1
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr) or name.startswith('_'):
+            return attr
+        scheduler = self._scheduler
+        client = self._client
+        api, weight, priority, orders = classify(name)
+        host = client_host(client, api)
+
+        def response_headers():
+            return getattr(getattr(client, 'response', None), 'headers', None)
+
+        def call(*args, **kwargs):
+            return scheduler.execute(
+                lambda: attr(*args, **kwargs), api, weight, priority, orders, response_headers, host
+            )
+        return call
+
+
+# Process-wide scheduler shared by all clients and raw requests
+request_scheduler = RequestScheduler()
@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+
+BAR_DTYPES = (
+    ('open_time', np.int64),
+    ('open', np.float64),
+    ('high', np.float64),
+    ('low', np.float64),
+    ('close', np.float64),
+    ('volume', np.float64),
+)
+FUNDING_DTYPES = (
+    ('time', np.int64),
+    ('rate', np.float64),
+)
+
+
+class RingBuffer:
+    """
+    Fixed-capacity columnar buffer preallocated once. Each row is written twice
+    (at slot i and i + capacity), so the newest `size` rows are always one
+    contiguous slice: reads are views and writes never reallocate. When full,
+    new rows overwrite the oldest.
+    """
+    def __init__(self, capacity, dtypes):
+        self.capacity = capacity
+        self._data = {field: np.zeros(2 * capacity, dtype=dtype) for field, dtype in dtypes}
+        self._next = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in self._data.values())
+
+    def view(self, field):
+        """Chronological view of a column. Only valid until the next write."""
+        end = self._next + self.capacity
+        return self._data[field][end - self.size:end]
+
+    def last(self, field):
+        if self.size == 0:
+            return None
+        return self._data[field][self._next + self.capacity - 1]
+
+    def clear(self):
+        self._next = 0
+        self.size = 0
+
+    def drop_newest(self, count):
+        count = min(count, self.size)
+        self._next = (self._next - count) % self.capacity
+        self.size -= count
+
+    def push(self, columns):
+        """Appends equal-length arrays keyed by field; only the newest `capacity` rows are kept."""
+        n = len(next(iter(columns.values())))
+        if n == 0:
+            return
+        skip = max(0, n - self.capacity)
+        slots = (self._next + np.arange(n - skip)) % self.capacity
+        for field, values in columns.items():
+            column = self._data[field]
+            column[slots] = values[skip:]
+            column[slots + self.capacity] = values[skip:]
+        self._next = int(slots[-1] + 1) % self.capacity
+        self.size = min(self.capacity, self.size + n - skip)
+
+
+class SymbolHistory:
+    """
+    Bounded per-symbol history for the native bar source: the last `capacity`
+    klines plus the funding rates covering them, both in RingBuffers. frame()
+    exposes them in the same column layout as DataIngestion.get_data().
+    """
+    def __init__(self, symbol, capacity, funding_capacity):
+        self.symbol = symbol
+        self.bars = RingBuffer(capacity, BAR_DTYPES)
+        self.funding = RingBuffer(funding_capacity, FUNDING_DTYPES)
+        # Funding forward-filled onto the bars, rebuilt in place by frame()
+        self._funding_rate = np.empty(capacity, dtype=np.float64)
+
+    @property
+    def nbytes(self):
+        return self.bars.nbytes + self.funding.nbytes + self._funding_rate.nbytes
+
+    def clear(self):
+        self.bars.clear()
+        self.funding.clear()
+
+    def last_open_time(self):
+        last = self.bars.last('open_time')
+        return None if last is None else int(last)
+
+    def last_funding_time(self):
+        last = self.funding.last('time')
+        return None if last is None else int(last)
+
+    def add_klines(self, klines):
+        """Adds Binance-format klines, replacing stored bars at or after the first new open time."""
+        if not klines:
+            return
+        raw = np.array([k[:6] for k in klines], dtype=np.float64)
+        columns = {field: raw[:, i] for i, (field, _) in enumerate(BAR_DTYPES)}
+        columns['open_time'] = raw[:, 0].astype(np.int64)
+        stored = self.bars.view('open_time')
+        cut = int(np.searchsorted(stored, columns['open_time'][0]))
+        self.bars.drop_newest(len(stored) - cut)
+        self.bars.push(columns)
+
+    def add_funding(self, rates):
+        """Adds Binance fundingRate records newer than the last stored one."""
+        last = self.last_funding_time()
+        rates = [r for r in rates if last is None or r['fundingTime'] > last]
+        if not rates:
+            return
+        self.funding.push({
+            'time': np.array([r['fundingTime'] for r in rates], dtype=np.int64),
+            'rate': np.array([r['fundingRate'] for r in rates], dtype=np.float64),
+        })
+
+    def _align_funding(self):
+        """Funding joined on exact open time and forward-filled, like DataIngestion._merge_funding."""
+        open_time = self.bars.view('open_time')
+        out = self._funding_rate[:len(open_time)]
+        out.fill(np.nan)
+        times = self.funding.view('time')
+        if len(times) == 0:
+            return out
+        idx = np.minimum(np.searchsorted(times, open_time), len(times) - 1)
+        matched = times[idx] == open_time
+        out[matched] = self.funding.view('rate')[idx[matched]]
+        last = np.where(matched, np.arange(len(out)), -1)
+        np.maximum.accumulate(last, out=last)
+        filled = last >= 0
+        out[filled] = out[last[filled]]
+        return out
+
+    def frame(self):
+        """DataFrame over the buffers (no copies). Only valid until the next add_klines()."""
+        return pd.DataFrame({
+            'Open time': self.bars.view('open_time').view('datetime64[ms]'),
+            'Open': self.bars.view('open'),
+            'High': self.bars.view('high'),
+            'Low': self.bars.view('low'),
+            'Close': self.bars.view('close'),
+            'Volume': self.bars.view('volume'),
+            'symbol': self.symbol,
+            'funding_rate': self._align_funding(),
+        }, copy=False)
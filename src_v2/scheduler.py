@@ -0,0 +1,77 @@
+import time
+from datetime import datetime, timedelta
+from metrics import metrics
+from pipeline import fetch_latest
+from snapshot import save_snapshot
+
+class PrefetchScheduler:
+    """
+    Moves everything that does not depend on the final candle in front of the close:
+    history, funding, exchange metadata and account state are loaded `lead_seconds`
+    before each boundary, so after the close only the last candle has to be fetched.
+    """
+    def __init__(self, data_ingestion, trading, symbols, next_close_fn, capital_fn,
+                 lead_seconds=300, close_buffer_seconds=2, max_workers=8, coordinator=None):
+        self.data_ingestion = data_ingestion
+        self.trading = trading
+        self.symbols = symbols
+        self.next_close_fn = next_close_fn
+        self.capital_fn = capital_fn
+        self.lead_seconds = lead_seconds
+        self.close_buffer_seconds = close_buffer_seconds
+        self.max_workers = max_workers
+        # In sharded mode the worker processes own the symbol history
+        self.coordinator = coordinator
+        self.capital = None
+
+    def warm_up(self):
+        """Loads all pre-close state. Errors only cost latency, get_latest() falls back to a full fetch."""
+        start = time.time()
+        with metrics.timer('stage_seconds', stage='warm_up'):
+            self._warm_up()
+        print(f"Warm-up complete in {time.time() - start:.1f}s")
+
+    def _warm_up(self):
+        if self.coordinator is not None:
+            # Warm-up has to be done by the close
+            self.coordinator.warm_up(timeout=self.lead_seconds)
+        else:
+            for symbol in self.symbols:
+                try:
+                    self.data_ingestion.prefetch(symbol)
+                except Exception as e:
+                    print(f"Error prefetching {symbol}: {e}")
+        try:
+            self.trading.load_exchange_info()
+        except Exception as e:
+            print(f"Error prefetching exchange info: {e}")
+        self.capital = self.capital_fn(self.trading)
+        # Lets a restart inside the trading window act without waiting on the exchange
+        save_snapshot({'capital': self.capital, 'symbol_info': self.trading.symbol_info})
+
+    def wait_and_warm_up(self):
+        """Sleeps until `lead_seconds` before the next close, warms up, then sleeps until just after the close."""
+        target = self.next_close_fn()
+        warm_at = target - timedelta(seconds=self.lead_seconds)
+
+        sleep_seconds = (warm_at - datetime.utcnow()).total_seconds()
+        if sleep_seconds > 0:
+            print(f"Next candle closes at {target} UTC. Warming up in {sleep_seconds/60:.2f} minutes.")
+            time.sleep(sleep_seconds)
+
+        self.warm_up()
+
+        sleep_seconds = (target - datetime.utcnow()).total_seconds() + self.close_buffer_seconds
+        if sleep_seconds > 0:
+            time.sleep(sleep_seconds)
+
+    def fetch_latest(self, candle_open):
+        """Fetches the final candle for every symbol in parallel. Returns {symbol: DataFrame}."""
+        return fetch_latest(self.data_ingestion, self.symbols, candle_open, max_workers=self.max_workers)
+
+    def pop_capital(self):
+        """Returns the capital captured during warm-up (once), or fetches it now."""
+        capital, self.capital = self.capital, None
+        if capital is None:
+            capital = self.capital_fn(self.trading)
+        return capital
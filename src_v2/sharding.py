@@ -0,0 +1,182 @@
+import time
+import queue
+import multiprocessing as mp
+from pipeline import fetch_latest, analyze_symbol
+
+# How long the coordinator waits for every shard to answer a command when no deadline is given
+DEFAULT_TIMEOUT = 5 * 60
+# How often a wait for replies checks that the workers are still running
+POLL_SECONDS = 1.0
+# Crashed workers are restarted this many times before their shard is dropped
+MAX_RESTARTS = 3
+
+
+def _worker_main(worker_id, symbols, tasks, results):
+    """
+    Worker process: owns the data/feature state for its shard of symbols and
+    answers 'warm_up' and 'analyze' commands from the coordinator. Every reply
+    echoes the command's sequence number so late replies can be told apart.
+    """
+    # Each process builds its own clients and model
+    from data_ingestion import DataIngestion
+    from model import Classifier
+    from trading_utils import TradingPrice
+    from memory import release_memory
+
+    try:
+        data_ingestion = DataIngestion()
+        model = Classifier()
+        trading_price = TradingPrice()
+    except Exception as e:
+        results.put((worker_id, 0, 'error', f"Worker init failed: {e}"))
+        return
+    results.put((worker_id, 0, 'ready', len(symbols)))
+
+    while True:
+        seq, command, payload = tasks.get()
+        try:
+            if command == 'stop':
+                return
+            elif command == 'warm_up':
+                for symbol in symbols:
+                    try:
+                        data_ingestion.prefetch(symbol)
+                    except Exception as e:
+                        print(f"Error prefetching {symbol}: {e}")
+                results.put((worker_id, seq, 'warm_up', None))
+            elif command == 'analyze':
+                latest_data = fetch_latest(data_ingestion, symbols, payload)
+                signals = {}
+                for symbol in symbols:
+                    result = analyze_symbol(symbol, latest_data.get(symbol), data_ingestion, model, trading_price)
+                    if result is not None:
+                        signals[symbol] = result
+                results.put((worker_id, seq, 'analyze', signals))
+                if data_ingestion.memory_mode == 'bounded':
+                    release_memory()
+        except Exception as e:
+            results.put((worker_id, seq, 'error', f"{command} failed: {e}"))
+
+
+class ShardCoordinator:
+    """
+    Splits the symbol universe across worker processes. Each worker keeps its
+    symbols' history and produces signals; the coordinator only gathers them so
+    portfolio weighting and execution stay in one place.
+    """
+    def __init__(self, symbols, n_workers, timeout=DEFAULT_TIMEOUT):
+        self.symbols = list(symbols)
+        self.n_workers = max(1, min(n_workers, len(self.symbols)))
+        self.timeout = timeout
+        # Round-robin keeps shards balanced without knowing per-symbol cost
+        self.shards = [self.symbols[i::self.n_workers] for i in range(self.n_workers)]
+
+        self._ctx = mp.get_context('spawn')
+        self._results = self._ctx.Queue()
+        self._tasks = [None] * self.n_workers
+        self._workers = [None] * self.n_workers
+        self._restarts = [0] * self.n_workers
+        for worker_id in range(self.n_workers):
+            self._start_worker(worker_id)
+
+        self._alive = set(range(self.n_workers))
+        self._ready = False
+        # Sequence number of the last broadcast; 0 is the workers' startup 'ready'
+        self._seq = 0
+
+    def _start_worker(self, worker_id):
+        tasks = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self.shards[worker_id], tasks, self._results),
+            name=f"shard-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        self._tasks[worker_id] = tasks
+        self._workers[worker_id] = process
+
+    def _reap(self, pending):
+        """
+        Removes crashed workers from `pending` and restarts them for the next command
+        (their shard starts cold and refetches its history). After MAX_RESTARTS the shard is dropped.
+        """
+        for worker_id in [w for w in pending if not self._workers[w].is_alive()]:
+            pending.discard(worker_id)
+            exitcode = self._workers[worker_id].exitcode
+            if self._restarts[worker_id] >= MAX_RESTARTS:
+                self._alive.discard(worker_id)
+                print(f"Shard worker {worker_id} died (exit code {exitcode}); dropping its "
+                      f"{len(self.shards[worker_id])} symbols after {MAX_RESTARTS} restarts")
+                continue
+            self._restarts[worker_id] += 1
+            print(f"Shard worker {worker_id} died (exit code {exitcode}); restarting")
+            self._start_worker(worker_id)
+
+    def _wait_ready(self):
+        # Deferred to the first command so startup does not wait for every worker to load its model
+        self._ready = True
+        # Workers that fail to start are dropped from all later commands; ones that crashed were restarted
+        restarts = list(self._restarts)
+        ready = set(self._gather('ready', 0))
+        restarted = {w for w in self._alive if self._restarts[w] > restarts[w]}
+        self._alive = ready | restarted
+        print(f"Started {len(self._alive)}/{self.n_workers} shard workers for {len(self.symbols)} symbols.")
+
+    def _broadcast(self, command, payload=None):
+        """Sends the command to every live worker and returns its sequence number."""
+        if not self._ready:
+            self._wait_ready()
+        self._seq += 1
+        for worker_id in self._alive:
+            self._tasks[worker_id].put((self._seq, command, payload))
+        return self._seq
+
+    def _gather(self, command, seq, timeout=None):
+        """
+        Collects one reply per worker to broadcast `seq` within `timeout` seconds.
+        Workers that fail, crash or miss the deadline are reported and skipped.
+        """
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        replies = {}
+        pending = set(self._alive)
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(f"Shard workers {sorted(pending)} timed out on '{command}'")
+                break
+            try:
+                worker_id, reply_seq, reply, payload = self._results.get(timeout=min(POLL_SECONDS, remaining))
+            except queue.Empty:
+                self._reap(pending)
+                continue
+            if reply_seq != seq:
+                # Late answer to an earlier command that already timed out
+                continue
+            if reply == 'error':
+                print(f"Shard worker {worker_id} error: {payload}")
+            else:
+                replies[worker_id] = payload
+            pending.discard(worker_id)
+        return replies
+
+    def warm_up(self, timeout=None):
+        """Every worker prefetches history for its shard."""
+        seq = self._broadcast('warm_up')
+        self._gather('warm_up', seq, timeout)
+
+    def analyze(self, candle_open, timeout=None):
+        """Returns {symbol: signal} merged across all shards that answer within `timeout` seconds."""
+        seq = self._broadcast('analyze', candle_open)
+        signals = {}
+        for shard_signals in self._gather('analyze', seq, timeout).values():
+            signals.update(shard_signals)
+        return signals
+
+    def close(self):
+        for worker_id in self._alive:
+            self._tasks[worker_id].put((None, 'stop', None))
+        for process in self._workers:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
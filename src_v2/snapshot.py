@@ -0,0 +1,32 @@
+import os
+import json
+import time
+
+SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "state_snapshot.json")
+
+
+def save_snapshot(state, path=SNAPSHOT_PATH):
+    """Atomically writes state (JSON-serializable) so a crash mid-write never leaves a torn file."""
+    state = dict(state, saved_at=time.time())
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Error saving snapshot: {e}")
+
+
+def load_snapshot(path=SNAPSHOT_PATH, max_age_seconds=None):
+    """Returns the saved state, or {} when it is missing, unreadable or older than max_age_seconds."""
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Error loading snapshot: {e}")
+        return {}
+    if max_age_seconds is not None and time.time() - state.get('saved_at', 0) > max_age_seconds:
+        return {}
+    return state
@@ -0,0 +1,161 @@
+import numpy as np
+from datetime import datetime, timedelta
+
+MINUTE_MS = 60 * 1000
+EPOCH = datetime(1970, 1, 1)
+_UNIT_MINUTES = {'m': 1, 'h': 60, 'd': 24 * 60}
+BAR_FIELDS = ('open_time', 'open', 'high', 'low', 'close', 'volume')
+
+
+class Timeframe:
+    """
+    A bar interval in Binance notation ('15m', '1h', '4h', '1d', ...).
+    Buckets are aligned on the UTC epoch, which matches Binance for every
+    interval up to 1d.
+    """
+    def __init__(self, interval):
+        unit = interval[-1:]
+        if unit not in _UNIT_MINUTES or not interval[:-1].isdigit():
+            raise ValueError(f"Unsupported interval: {interval}")
+        self.interval = interval
+        self.minutes = int(interval[:-1]) * _UNIT_MINUTES[unit]
+        self.period = timedelta(minutes=self.minutes)
+        self.period_ms = self.minutes * MINUTE_MS
+
+    def __repr__(self):
+        return f"Timeframe('{self.interval}')"
+
+    def bucket_start(self, dt):
+        """Open time of the bar containing dt (naive UTC)."""
+        elapsed = (dt - EPOCH) // timedelta(minutes=1)
+        return EPOCH + timedelta(minutes=elapsed - elapsed % self.minutes)
+
+    def next_close(self, now=None):
+        """Close time of the bar currently forming."""
+        now = now or datetime.utcnow()
+        return self.bucket_start(now) + self.period
+
+    def is_within_window(self, minutes_tolerance, now=None):
+        """True during the first minutes_tolerance minutes after a close (capped at one bar)."""
+        now = now or datetime.utcnow()
+        tolerance = timedelta(minutes=min(minutes_tolerance, self.minutes))
+        return now - self.bucket_start(now) < tolerance
+
+
+def _resample(bars, start, period_ms):
+    """
+    Vectorized OHLCV aggregation of bars[start:] into period_ms buckets.
+    Returns the aggregated arrays and the base index where the last bucket begins.
+    """
+    open_time = bars['open_time'][start:]
+    buckets = open_time // period_ms
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    ends = np.concatenate((starts[1:], [len(open_time)])) - 1
+    out = {
+        'open_time': buckets[starts] * period_ms,
+        'open': bars['open'][start:][starts],
+        'high': np.maximum.reduceat(bars['high'][start:], starts),
+        'low': np.minimum.reduceat(bars['low'][start:], starts),
+        'close': bars['close'][start:][ends],
+        'volume': np.add.reduceat(bars['volume'][start:], starts),
+    }
+    return out, start + int(starts[-1])
+
+
+class BarStore:
+    """
+    Per-symbol store of 1-minute OHLCV bars held as numpy arrays, resampled on
+    demand into any higher Timeframe. Resampled series are cached and updated
+    incrementally: only the last (possibly still forming) bucket and any newer
+    ones are recomputed when minute bars are appended.
+    """
+    def __init__(self, max_minutes=None):
+        self.max_minutes = max_minutes
+        self._bars = {}
+        # symbol -> {minutes: [resampled arrays, base index where the last bucket starts]}
+        # Keyed per symbol so threads working on different symbols never share a cache dict
+        self._resampled = {}
+
+    def __len__(self):
+        return len(self._bars)
+
+    def bars(self, symbol):
+        return self._bars.get(symbol)
+
+    def last_open_time(self, symbol):
+        bars = self._bars.get(symbol)
+        if bars is None or len(bars['open_time']) == 0:
+            return None
+        return int(bars['open_time'][-1])
+
+    def append(self, symbol, klines):
+        """
+        Adds Binance-format 1m klines. Rows at or after the first new open time are
+        replaced, so re-fetching the last (forming) minute is safe.
+        """
+        if not klines:
+            return
+        raw = np.array([k[:6] for k in klines], dtype=np.float64)
+        new = {field: raw[:, i] for i, field in enumerate(BAR_FIELDS)}
+        new['open_time'] = raw[:, 0].astype(np.int64)
+
+        bars = self._bars.get(symbol)
+        if bars is None:
+            self._bars[symbol] = bars = new
+        else:
+            cut = int(np.searchsorted(bars['open_time'], new['open_time'][0]))
+            for field in BAR_FIELDS:
+                bars[field] = np.concatenate((bars[field][:cut], new[field]))
+            self._invalidate(symbol, cut)
+
+        if self.max_minutes and len(bars['open_time']) > self.max_minutes:
+            self._trim(symbol, len(bars['open_time']) - self.max_minutes)
+
+    def _invalidate(self, symbol, cut):
+        # Cached buckets that started at or after the cut were built from replaced rows
+        cache = self._resampled.get(symbol, {})
+        for minutes in [m for m, cached in cache.items() if cut < cached[1]]:
+            del cache[minutes]
+
+    def _trim(self, symbol, count):
+        bars = self._bars[symbol]
+        for field in BAR_FIELDS:
+            bars[field] = bars[field][count:]
+        cache = self._resampled.get(symbol, {})
+        for minutes in list(cache):
+            cached = cache[minutes]
+            cached[1] -= count
+            if cached[1] < 0:
+                del cache[minutes]
+                continue
+            # Drop aggregated buckets that ended before the retained base data
+            period_ms = minutes * MINUTE_MS
+            first_open = int(bars['open_time'][0])
+            first_bucket = first_open - first_open % period_ms
+            keep = cached[0]['open_time'] >= first_bucket
+            cached[0] = {field: values[keep] for field, values in cached[0].items()}
+            if first_open != first_bucket:
+                # The first retained bucket lost its earliest minutes; rebuild it from what is left
+                end = int(np.searchsorted(bars['open_time'], first_bucket + period_ms))
+                head, _ = _resample({field: bars[field][:end] for field in BAR_FIELDS}, 0, period_ms)
+                for field, values in cached[0].items():
+                    values[0] = head[field][0]
+
+    def resample(self, symbol, timeframe):
+        """Returns {'open_time', 'open', 'high', 'low', 'close', 'volume'} arrays at the given timeframe."""
+        bars = self._bars.get(symbol)
+        if bars is None or len(bars['open_time']) == 0:
+            return {field: np.array([]) for field in BAR_FIELDS}
+        if timeframe.minutes == 1:
+            return bars
+
+        cache = self._resampled.setdefault(symbol, {})
+        cached = cache.get(timeframe.minutes)
+        if cached is None:
+            out, last_start = _resample(bars, 0, timeframe.period_ms)
+        else:
+            # Recompute from the start of the last cached bucket onwards
+            tail, last_start = _resample(bars, cached[1], timeframe.period_ms)
+            out = {field: np.concatenate((values[:-1], tail[field])) for field, values in cached[0].items()}
+        cache[timeframe.minutes] = [out, last_start]
+        return out
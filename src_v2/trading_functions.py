@@ -1,28 +1,36 @@
-from env import demo_futures_api , demo_futures_secret , test_net
-from binance.client import Client
+import threading
 from env import leverage_large_edge , leverage_small_edge , stop_loss_large_edge , stop_loss_small_edge
 from database_orm import Database
+from exchange import get_client
 
 class TradingFunctions:
-    def __init__(self , client):
-        self.client = Client(demo_futures_api , demo_futures_secret , testnet=test_net)
+    def __init__(self , client=None , sync=True):
+        # Shared process-wide client unless one is passed in, created on first use
+        self._client = client
         self.db = Database()
-        self.sync_state()
+        # symbol -> (qty_step, price_tick), filled from futures_exchange_info
+        self.symbol_info = {}
+        if sync:
+            self.sync_state()
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = get_client('trading')
+        return self._client
+
+    def sync_state_async(self):
+        """Runs sync_state() in a background thread so startup does not wait on the exchange."""
+        thread = threading.Thread(target=self.sync_state, name="sync-state", daemon=True)
+        thread.start()
+        return thread
 
     def sync_state(self):
         """Syncs local database state with Binance."""
         print("Syncing state with Binance...")
         try:
             # Sync orders that we think are open
-            local_open_orders = self.db.get_open_orders_local()
-            for order_id, symbol in local_open_orders:
-                try:
-                    status_info = self.client.futures_get_order(symbol=symbol, orderId=order_id)
-                    current_status = status_info['status']
-                    self.db.update_order_status(order_id, current_status)
-                    print(f"Synced order {order_id}: {current_status}")
-                except Exception as e:
-                    print(f"Error syncing order {order_id}: {e}")
+            self.sync_orders()
             
             # Sync Balance
             self.get_balance()
@@ -30,6 +38,25 @@ class TradingFunctions:
         except Exception as e:
             print(f"Error in sync_state: {e}")
 
+    def sync_orders(self):
+        """
+        Refreshes status, executed quantity and average fill price of every order that is
+        open locally or was logged without a fill price (e.g. TP/SL orders that triggered).
+        """
+        for order_id, symbol in self.db.get_orders_to_sync():
+            try:
+                status_info = self.client.futures_get_order(symbol=symbol, orderId=order_id)
+                current_status = status_info['status']
+                self.db.update_order_fill(
+                    order_id,
+                    current_status,
+                    float(status_info.get('executedQty', 0) or 0),
+                    float(status_info.get('avgPrice', 0) or 0)
+                )
+                print(f"Synced order {order_id}: {current_status}")
+            except Exception as e:
+                print(f"Error syncing order {order_id}: {e}")
+
     def get_balance(self):
         balance = self.client.futures_account_balance()
         # Log significant balances to DB
@@ -48,15 +75,23 @@ class TradingFunctions:
         precision = int(round(-math.log(step_size, 10), 0))
         return float(round(quantity, precision))
 
+    def load_exchange_info(self):
+        """Caches step size and price precision for every futures symbol."""
+        info = self.client.futures_exchange_info()
+        symbol_info = {}
+        for s in info['symbols']:
+            qty_step = float([f['stepSize'] for f in s['filters'] if f['filterType'] == 'LOT_SIZE'][0])
+            price_tick = float([f['tickSize'] for f in s['filters'] if f['filterType'] == 'PRICE_FILTER'][0])
+            symbol_info[s['symbol']] = (qty_step, price_tick)
+        self.symbol_info = symbol_info
+        return symbol_info
+
     def get_symbol_info(self, symbol):
         """Gets step size and price precision for a symbol."""
+        if symbol in self.symbol_info:
+            return self.symbol_info[symbol]
         try:
-            info = self.client.futures_exchange_info()
-            for s in info['symbols']:
-                if s['symbol'] == symbol:
-                    qty_step = float([f['stepSize'] for f in s['filters'] if f['filterType'] == 'LOT_SIZE'][0])
-                    price_tick = float([f['tickSize'] for f in s['filters'] if f['filterType'] == 'PRICE_FILTER'][0])
-                    return qty_step, price_tick
+            return self.load_exchange_info().get(symbol)
         except Exception as e:
             print(f"Error fetching symbol info for {symbol}: {e}")
             return 0.001, 0.01 # Fallback
@@ -109,13 +144,15 @@ class TradingFunctions:
             symbol=symbol,
             side=side,
             type='MARKET',
-            quantity=quantity
+            quantity=quantity,
+            # RESULT waits for the fill, so the logged order carries avgPrice and executedQty
+            newOrderRespType='RESULT'
         )
         self.db.log_order(entry_order, leverage)
 
         # 4. Calculate Levels using Fill Price (or fallback to Mark)
-        # Usually Market order response doesn't have avgPrice immediately unless we query order
-        # We will use current_price (Mark Price) which is safer for immediate SL placement
+        # The RESULT response carries avgPrice, but brackets are set off the mark price
+        # (current_price), which is safer for immediate SL placement
         entry_price = current_price 
         
         print(f"Entry {symbol} @ {entry_price}. ATR: {atr}. Setting Brackets...")
@@ -146,13 +183,15 @@ class TradingFunctions:
         
         # 5. Place Stop Loss (Full Position)
         try:
-            self.client.futures_create_order(
+            sl_order = self.client.futures_create_order(
                 symbol=symbol,
                 side=tp_side,
                 type='STOP_MARKET',
                 stopPrice=sl_price,
                 closePosition=True
             )
+            # Logged as NEW; sync_orders() records the fill if it triggers
+            self.db.log_order(sl_order, leverage)
             print(f"  SL set at {sl_price}")
         except Exception as e:
             print(f"  Failed to set SL: {e}")
@@ -163,7 +202,7 @@ class TradingFunctions:
         for price, qty, label in tps:
             if qty > 0:
                 try:
-                    self.client.futures_create_order(
+                    tp_order = self.client.futures_create_order(
                         symbol=symbol,
                         side=tp_side,
                         type='TAKE_PROFIT_MARKET',
@@ -171,6 +210,7 @@ class TradingFunctions:
                         quantity=qty,
                         reduceOnly=True
                     )
+                    self.db.log_order(tp_order, leverage)
                     print(f"  {label} set at {price} (Qty: {qty})")
                 except Exception as e:
                     print(f"  Failed to set {label}: {e}")
@@ -200,7 +240,8 @@ class TradingFunctions:
                 symbol=symbol,
                 side=side,
                 type=order_type,
-                quantity=quantity
+                quantity=quantity,
+                newOrderRespType='RESULT'
             )
         elif order_type == 'LIMIT':
             order = self.client.futures_create_order(
@@ -248,7 +289,8 @@ class TradingFunctions:
                 side=side,
                 type='MARKET',
                 quantity=quantity,
-                reduceOnly=True
+                reduceOnly=True,
+                newOrderRespType='RESULT'
             )
             self.db.log_order(order, 0) # Log closing order
             return order
@@ -256,5 +298,5 @@ class TradingFunctions:
             print(f"Error closing position for {symbol}: {e}")
 
 if __name__ == "__main__":
-    client = Client(demo_futures_api , demo_futures_secret , testnet=test_net)
+    client = get_client('trading')
     print(client.futures_account_balance())
\ No newline at end of file
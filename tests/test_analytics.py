@@ -0,0 +1,45 @@
+from analytics import Analytics
+from database_orm import Database
+
+
+def _order(order_id, side, status='FILLED', price='0', avg_price='0', qty='1'):
+    return {'orderId': order_id, 'symbol': 'BTCUSDT', 'side': side, 'type': 'MARKET',
+            'origQty': qty, 'executedQty': qty, 'price': price, 'avgPrice': avg_price, 'status': status}
+
+
+def test_fill_is_valued_once_its_price_is_synced(tmp_path):
+    db = Database(str(tmp_path / 'trading.db'))
+    analytics = Analytics(db)
+    db.log_order(_order(1, 'BUY', avg_price='100'), 1)
+    # TP fill logged as NEW without a price, later reported FILLED by the exchange
+    db.log_order(_order(2, 'SELL', status='NEW', qty='0'), 1)
+    db.update_order_status(2, 'FILLED')
+
+    assert analytics.refresh() == (0, 1)
+    assert [order_id for order_id, _ in db.get_orders_to_sync()] == [2]
+
+    db.update_order_fill(2, 'FILLED', 1.0, 110.0)
+    assert analytics.refresh() == (0, 1)
+    symbol, realized, position, *_ = analytics.symbol_pnl('BTCUSDT')[0]
+    assert (realized, position) == (10.0, 0.0)
+    assert db.get_orders_to_sync() == []
+    db.close()
+
+
+def test_later_fills_wait_for_an_unpriced_earlier_fill(tmp_path):
+    db = Database(str(tmp_path / 'trading.db'))
+    analytics = Analytics(db)
+    db.log_order(_order(1, 'BUY', avg_price='100'), 1)
+    db.log_order(dict(_order(2, 'SELL', status='NEW', qty='2'), executedQty='0'), 1)
+    db.update_order_status(2, 'FILLED')
+    db.log_order(_order(3, 'BUY', avg_price='90', qty='2'), 1)
+
+    # Order 3 must not be folded in ahead of order 2
+    assert analytics.refresh() == (0, 1)
+    db.update_order_fill(2, 'FILLED', 2.0, 110.0)
+    assert analytics.refresh() == (0, 2)
+
+    # Sell 2 @ 110 flips long 1 @ 100 to short 1 @ 110, buy 2 @ 90 flips it back to long 1 @ 90
+    symbol, realized, position, avg_price, *_ = analytics.symbol_pnl('BTCUSDT')[0]
+    assert (realized, position, avg_price) == (30.0, 1.0, 90.0)
+    db.close()
@@ -0,0 +1,44 @@
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from database_orm import Database, _STOP
+
+
+def test_writes_from_several_threads_are_visible_after_flush_and_close(tmp_path):
+    path = str(tmp_path / 'trading.db')
+    db = Database(path, batch_size=50)
+
+    def write(thread):
+        for i in range(200):
+            db.log_balance(f"T{thread}", 100 + i, 0)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(write, range(4)))
+
+    assert db.flush()
+    assert db.conn.execute("SELECT COUNT(*) FROM balance_history").fetchone()[0] == 800
+
+    db.log_balance('USDT', 1, 0)
+    db.close()
+    # close() commits the tail of the queue and checkpoints the WAL into the main file
+    assert not os.path.exists(path + '-wal') or os.path.getsize(path + '-wal') == 0
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM balance_history").fetchone()[0] == 801
+    conn.close()
+
+
+def test_flush_returns_when_the_writer_is_gone(tmp_path):
+    db = Database(str(tmp_path / 'trading.db'))
+    db._queue.put(_STOP)
+    db._writer.join()
+    # A write that slipped in behind the stop sentinel is never committed
+    db._queue.put(("INSERT INTO balance_history (asset) VALUES (?)", ('USDT',)))
+
+    assert db.flush(timeout=5) is False
+
+
+def test_writes_after_close_are_rejected(tmp_path):
+    db = Database(str(tmp_path / 'trading.db'))
+    db.close()
+    db.log_balance('USDT', 1, 0)
+    assert db.flush(timeout=1)
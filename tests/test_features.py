@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+from data_ingestion import DataIngestion
+from features import FeatureEngine, TREND_REGIME_CODES
+
+
+def _trending_frame(n=400):
+    rng = np.random.default_rng(3)
+    # Every 6-bar return sum is above 1%, so only the 'trend' label survives dropna
+    close = 100 * np.exp(np.cumsum(0.01 + 0.002 * rng.random(n)))
+    return pd.DataFrame({
+        'Open time': pd.date_range('2024-01-01', periods=n, freq='4h'),
+        'Open': close, 'High': close * 1.01, 'Low': close * 0.99, 'Close': close,
+        'Volume': 1000 + 100 * rng.random(n),
+        'symbol': 'BTCUSDT',
+        'funding_rate': 1e-4 * rng.normal(size=n),
+    })
+
+
+def test_regime_codes_are_fixed_when_a_label_is_missing():
+    frame = _trending_frame()
+    full = DataIngestion(client=object(), memory_mode='full').__engineer_features__(frame.copy())
+    bounded = FeatureEngine().compute(frame.copy())
+
+    assert not full.empty
+    assert (full['trend_regime_code'] == TREND_REGIME_CODES['trend']).all()
+    pd.testing.assert_frame_equal(full, bounded, check_dtype=False)
@@ -0,0 +1,31 @@
+from metrics import Metrics
+
+
+def test_used_weight_gauge_is_labelled_by_api_and_host():
+    registry = Metrics(enabled=True)
+    registry.record_used_weight({'X-MBX-USED-WEIGHT-1M': '40'}, endpoint='futures_klines', api='futures',
+                                url='https://fapi.binance.com/fapi/v1/klines')
+    registry.record_used_weight({'X-MBX-USED-WEIGHT-1M': '7'}, endpoint='futures_get_order', api='futures',
+                                url='https://testnet.binancefuture.com/fapi/v1/order')
+
+    gauges = {tuple(sorted(g['labels'].items())): g['value']
+              for g in registry.snapshot()['gauges'] if g['name'] == 'binance_used_weight_1m'}
+    assert gauges == {
+        (('api', 'futures'), ('host', 'fapi.binance.com')): 40.0,
+        (('api', 'futures'), ('host', 'testnet.binancefuture.com')): 7.0,
+    }
+
+
+def test_prometheus_output_declares_types_and_escapes_labels():
+    registry = Metrics(enabled=True)
+    registry.inc('symbol_errors_total', stage='analysis', symbol='BTCUSDT')
+    registry.set_gauge('memory_rss_bytes', 10)
+    registry.observe('stage_seconds', 0.2, stage='predict')
+    registry.inc('errors_total', error='bad "quote" \\ and\nnewline')
+
+    lines = registry.render_prometheus().splitlines()
+    assert '# TYPE symbol_errors_total counter' in lines
+    assert '# TYPE memory_rss_bytes gauge' in lines
+    assert '# TYPE stage_seconds histogram' in lines
+    assert lines.index('# TYPE stage_seconds histogram') < lines.index('stage_seconds_count{stage="predict"} 1')
+    assert 'errors_total{error="bad \\"quote\\" \\\\ and\\nnewline"} 1' in lines
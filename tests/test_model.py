@@ -0,0 +1,15 @@
+import pytest
+from model import Classifier
+
+
+def test_synchronous_load_raises_on_a_bad_model(tmp_path):
+    path = tmp_path / 'model.pkl'
+    path.write_bytes(b'not a pickle')
+    with pytest.raises(Exception):
+        Classifier(path=str(path))
+
+
+def test_background_load_failure_surfaces_at_predict(tmp_path):
+    classifier = Classifier(path=str(tmp_path / 'missing.pkl'), background=True)
+    with pytest.raises(RuntimeError):
+        classifier.wait_until_loaded()
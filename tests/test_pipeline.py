@@ -0,0 +1,40 @@
+import pandas as pd
+from pipeline import fetch_latest
+
+
+class StaleIngestion:
+    def __init__(self, last_open):
+        self.frames = {symbol: pd.DataFrame({'Open time': [pd.Timestamp(t)]}) for symbol, t in last_open.items()}
+        self.calls = {symbol: 0 for symbol in last_open}
+
+    def get_latest(self, symbol):
+        self.calls[symbol] += 1
+        return self.frames[symbol]
+
+
+def test_symbols_still_missing_the_candle_are_skipped():
+    candle_open = pd.Timestamp('2024-01-01 04:00')
+    ingestion = StaleIngestion({'FRESHUSDT': '2024-01-01 04:00', 'STALEUSDT': '2024-01-01 00:00'})
+
+    latest = fetch_latest(ingestion, ['FRESHUSDT', 'STALEUSDT'], candle_open, max_wait=0.05, retry_delay=0.01)
+
+    assert list(latest) == ['FRESHUSDT']
+    assert ingestion.calls['FRESHUSDT'] == 1
+    assert ingestion.calls['STALEUSDT'] > 1
+
+
+class LateIngestion(StaleIngestion):
+    def get_latest(self, symbol):
+        self.calls[symbol] += 1
+        if self.calls[symbol] == 3:
+            self.frames[symbol] = pd.DataFrame({'Open time': [pd.Timestamp('2024-01-01 04:00')]})
+        return self.frames[symbol]
+
+
+def test_late_candles_are_waited_for_until_the_deadline():
+    ingestion = LateIngestion({'SLOWUSDT': '2024-01-01 00:00'})
+
+    latest = fetch_latest(ingestion, ['SLOWUSDT'], pd.Timestamp('2024-01-01 04:00'), max_wait=5, retry_delay=0.01)
+
+    assert list(latest) == ['SLOWUSDT']
+    assert ingestion.calls['SLOWUSDT'] == 3
@@ -0,0 +1,40 @@
+import numpy as np
+from portfolio import PortfolioAllocator
+
+
+def test_raise_mode_respects_gross_cap_when_minimums_do_not_fit():
+    # 300 minimum-size positions would need 1800 against a 450 cap
+    rng = np.random.default_rng(0)
+    allocator = PortfolioAllocator(max_gross=0.5, min_notional=6.0, min_notional_mode='raise')
+    weights, notionals = allocator.allocate(
+        edges=np.ones(300), volatilities=rng.uniform(0.01, 0.05, 300), capital=900.0
+    )
+    assert notionals.sum() <= 450.0 + 1e-6
+    held = notionals > 0
+    assert held.sum() == 75
+    assert np.all(notionals[held] >= 6.0 - 1e-9)
+    np.testing.assert_allclose(weights, notionals / 900.0)
+
+
+def test_raise_mode_takes_the_raise_out_of_larger_positions():
+    allocator = PortfolioAllocator(max_gross=1.0, min_notional=6.0, min_notional_mode='raise')
+    weights, notionals = allocator.allocate(
+        edges=np.ones(3), volatilities=np.array([0.01, 0.01, 1.0]), capital=100.0
+    )
+    assert notionals[2] == 6.0
+    assert np.isclose(notionals.sum(), 100.0)
+    assert np.isclose(notionals[0], notionals[1])
+    np.testing.assert_allclose(weights, notionals / 100.0)
+
+
+def test_max_weight_is_a_fraction_of_capital_when_gross_cap_binds():
+    allocator = PortfolioAllocator(max_weight=0.3, max_gross=0.5, min_notional=0.0, min_notional_mode='drop')
+    weights = allocator.target_weights(edges=np.ones(4), volatilities=np.array([0.01, 0.05, 0.05, 0.05]))
+    np.testing.assert_allclose(weights, [0.3, 0.2 / 3, 0.2 / 3, 0.2 / 3])
+
+
+def test_zero_min_notional_leaves_the_weights_alone():
+    allocator = PortfolioAllocator(max_gross=0.5, min_notional=0.0, min_notional_mode='raise')
+    weights, notionals = allocator.allocate(edges=np.ones(3), volatilities=np.array([0.01, 0.02, 0.04]), capital=100.0)
+    np.testing.assert_allclose(weights, allocator.target_weights(np.ones(3), np.array([0.01, 0.02, 0.04])))
+    np.testing.assert_allclose(notionals, weights * 100.0)
@@ -0,0 +1,55 @@
+import threading
+import time
+from rate_limiter import RequestScheduler, ScheduledClient, ORDER, MARKET_DATA
+
+
+class KlinesClient:
+    def __init__(self, n_bars):
+        self.klines = [[i * 60000, '1', '1', '1', '1', '1'] for i in range(n_bars)]
+
+    def get_klines(self, symbol, interval, startTime=0, limit=500, endTime=None):
+        return [k for k in self.klines if k[0] >= startTime][:limit]
+
+
+class CountingScheduler(RequestScheduler):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def acquire(self, api, weight=1, priority=2, orders=0, host=None):
+        self.calls.append((api, weight))
+        super().acquire(api, weight, priority, orders, host)
+
+
+def test_historical_klines_schedule_every_page():
+    scheduler = CountingScheduler()
+    client = ScheduledClient(KlinesClient(2500), scheduler)
+
+    klines = client.get_historical_klines('BTCUSDT', '1m', 0)
+
+    assert [k[0] for k in klines] == [i * 60000 for i in range(2500)]
+    assert scheduler.calls == [('spot', 2)] * 3
+
+
+def test_used_weight_is_tracked_per_host():
+    scheduler = RequestScheduler(limits={'futures_weight': (100, 60)})
+    scheduler.update_from_headers('futures', {'X-MBX-USED-WEIGHT-1M': '100'}, host='testnet.binancefuture.com')
+
+    assert scheduler._bucket('testnet.binancefuture.com', 'futures_weight').tokens < 0
+    assert scheduler._bucket('fapi.binance.com', 'futures_weight').tokens == 80
+
+
+def test_blocked_futures_orders_do_not_stall_spot_market_data():
+    scheduler = RequestScheduler()
+    scheduler.backoff('futures', 418, retry_after=60, host='fapi.binance.com')
+    blocked = threading.Thread(target=scheduler.acquire, args=('futures', 1, ORDER, 1, 'fapi.binance.com'),
+                               daemon=True)
+    blocked.start()
+    time.sleep(0.05)
+
+    spot = threading.Thread(target=scheduler.acquire, args=('spot', 2, MARKET_DATA, 0, 'api.binance.com'),
+                            daemon=True)
+    spot.start()
+    spot.join(timeout=1)
+    assert not spot.is_alive()
+    assert blocked.is_alive()
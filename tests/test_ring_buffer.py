@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+from data_ingestion import DataIngestion
+from ring_buffer import RingBuffer, SymbolHistory, BAR_DTYPES
+
+BAR_MS = 4 * 60 * 60 * 1000
+
+
+def _klines(n, rng):
+    close = 100 * np.exp(np.cumsum(0.01 * rng.normal(size=n)))
+    return [[i * BAR_MS, f"{c * 1.001}", f"{c * 1.01}", f"{c * 0.99}", f"{c}", f"{v}",
+             (i + 1) * BAR_MS - 1, '0', 0, '0', '0', '0']
+            for i, (c, v) in enumerate(zip(close, 1000 + 100 * rng.random(n)))]
+
+
+def _funding(n_bars, rng):
+    # Settles every 8h, on every other 4h open time
+    return [{'symbol': 'BTCUSDT', 'fundingTime': t, 'fundingRate': f"{1e-4 * rng.normal()}"}
+            for t in range(0, n_bars * BAR_MS, 2 * BAR_MS)]
+
+
+def test_ring_buffer_keeps_the_newest_rows_across_wraparound():
+    ring = RingBuffer(5, BAR_DTYPES[:1])
+    ring.push({'open_time': np.arange(3)})
+    ring.push({'open_time': np.arange(3, 9)})
+    assert ring.view('open_time').tolist() == [4, 5, 6, 7, 8]
+    ring.drop_newest(2)
+    ring.push({'open_time': np.array([60, 70, 80])})
+    assert ring.view('open_time').tolist() == [5, 6, 60, 70, 80]
+    assert ring.last('open_time') == 80
+
+
+def test_symbol_history_matches_the_pandas_path_after_wraparound():
+    rng = np.random.default_rng(11)
+    n_bars, capacity = 1000, 300
+    final = _klines(n_bars, rng)
+    funding = _funding(n_bars, rng)
+    history = SymbolHistory('BTCUSDT', capacity, capacity // 2 + 8)
+
+    # Feed in chunks; each chunk ends on a still-forming candle that the next chunk replaces
+    start = 0
+    for end in list(range(250, n_bars, 37)) + [n_bars]:
+        klines = final[max(start - 1, 0):end]
+        if end < n_bars:
+            forming = list(klines[-1])
+            forming[4] = f"{float(forming[4]) * 1.05}"
+            klines = klines[:-1] + [forming]
+        history.add_klines(klines)
+        history.add_funding([r for r in funding if r['fundingTime'] <= final[end - 1][0]])
+        start = end
+
+    ingestion = DataIngestion(client=object(), memory_mode='full')
+    kept = final[-capacity:]
+    reference = ingestion._klines_to_frame(kept, 'BTCUSDT')[['Open time', 'Open', 'High', 'Low', 'Close', 'Volume', 'symbol']]
+    # Same frame _fetch_funding_frame builds, without the network
+    df_funding = pd.DataFrame([{'symbol': r['symbol'], 'Open time': pd.to_datetime(r['fundingTime'], unit='ms'),
+                                'funding_rate': float(r['fundingRate'])}
+                               for r in funding if kept[0][0] <= r['fundingTime'] <= kept[-1][0]])
+    reference = ingestion._merge_funding(reference, df_funding)
+
+    frame = history.frame()
+    assert len(frame) == capacity
+    pd.testing.assert_frame_equal(frame, reference, check_dtype=False)
+
+    bounded = DataIngestion(client=object(), memory_mode='bounded')
+    pd.testing.assert_frame_equal(bounded.__engineer_features__(frame), ingestion.__engineer_features__(reference.copy()),
+                                  check_dtype=False)
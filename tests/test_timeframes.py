@@ -0,0 +1,66 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from timeframes import BarStore, Timeframe, MINUTE_MS, BAR_FIELDS
+
+
+def _klines(start_minute, count, rng):
+    close = 100 + np.cumsum(rng.normal(size=count))
+    return [[(start_minute + i) * MINUTE_MS, close[i] + 0.1, close[i] + rng.random(), close[i] - rng.random(),
+             close[i], rng.random() * 10] for i in range(count)]
+
+
+def test_incremental_resample_matches_full_resample_after_trims():
+    rng = np.random.default_rng(7)
+    timeframe = Timeframe('1h')
+    incremental = BarStore(max_minutes=500)
+    # Chunks that do not line up with the hour, so trims cut through buckets
+    minute = 17
+    for count in (400, 37, 90, 61, 200, 5, 143):
+        incremental.append('BTCUSDT', _klines(minute, count, rng))
+        incremental.resample('BTCUSDT', timeframe)
+        minute += count
+
+    bars = incremental.bars('BTCUSDT')
+    full = BarStore()
+    full.append('BTCUSDT', [[bars[field][i] for field in BAR_FIELDS] for i in range(len(bars['open_time']))])
+
+    expected = full.resample('BTCUSDT', timeframe)
+    actual = incremental.resample('BTCUSDT', timeframe)
+    for field in BAR_FIELDS:
+        np.testing.assert_array_equal(actual[field], expected[field])
+
+
+def test_symbols_can_be_appended_and_resampled_from_parallel_threads():
+    store = BarStore(max_minutes=300)
+    timeframes = [Timeframe('5m'), Timeframe('15m'), Timeframe('1h')]
+
+    def run(index):
+        rng = np.random.default_rng(index)
+        symbol = f"SYM{index}USDT"
+        minute = 0
+        for _ in range(200):
+            store.append(symbol, _klines(minute, 7, rng))
+            minute += 7
+            for timeframe in timeframes:
+                store.resample(symbol, timeframe)
+        return symbol
+
+    # Switch threads as often as possible so the appends and resamples interleave
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            symbols = list(pool.map(run, range(16)))
+    finally:
+        sys.setswitchinterval(interval)
+
+    for symbol in symbols:
+        bars = store.bars(symbol)
+        full = BarStore()
+        full.append(symbol, [[bars[field][i] for field in BAR_FIELDS] for i in range(len(bars['open_time']))])
+        for timeframe in timeframes:
+            expected = full.resample(symbol, timeframe)
+            actual = store.resample(symbol, timeframe)
+            for field in BAR_FIELDS:
+                np.testing.assert_array_equal(actual[field], expected[field])